@@ -0,0 +1,237 @@
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path:
+    sys.path.insert(0, BASE_DIR)
+
+from config import RECOURSE_DIR  # noqa: E402
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Метрики, для которых рост значения — это ухудшение
+LOWER_IS_BETTER = ('p50', 'p99', 'peak_rss_mb', 'model_load_s')
+# Метрики, для которых ухудшение — это падение значения
+HIGHER_IS_BETTER = ('mb_per_s', 'pages_per_s', 'tokens_per_s')
+
+EXTRACTORS = {
+    'pdf': ('parser.utils.pdf_extractor', 'extract_text_from_pdf'),
+    'docx': ('parser.utils.docx_extractor', 'extract_text_from_docx'),
+    'doc': ('parser.utils.doc_extractor', 'extract_text_from_doc'),
+    'djvu': ('parser.utils.djvu_extractor', 'extract_text_from_djvu'),
+}
+
+SENTENCE = "Парсер извлекает текст из документов и определяет части речи, леммы и зависимости. "
+
+
+def make_synthetic_pdf(path, pages=200, lines=40):
+    import fitz
+
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page()
+        text = '\n'.join(f"Page {page_num} line {line}: lorem ipsum dolor sit amet" for line in range(lines))
+        page.insert_text((36, 36), text, fontsize=9)
+    document.save(path)
+    document.close()
+
+
+def make_synthetic_docx(path, paragraphs=5000):
+    from docx import Document
+
+    document = Document()
+    for index in range(paragraphs):
+        document.add_paragraph(f"{index}. {SENTENCE * 3}")
+    document.save(path)
+
+
+def build_corpus(directory, synthetic=True):
+    # (имя случая, формат, путь к файлу)
+    cases = []
+    for file_format in ('pdf', 'docx', 'doc', 'djvu'):
+        cases.append((f"{file_format}:6.{file_format}", file_format, os.path.join(RECOURSE_DIR, f"6.{file_format}")))
+    if synthetic:
+        pdf_path = os.path.join(directory, 'synthetic.pdf')
+        docx_path = os.path.join(directory, 'synthetic.docx')
+        make_synthetic_pdf(pdf_path)
+        make_synthetic_docx(docx_path)
+        cases.append(("pdf:synthetic", 'pdf', pdf_path))
+        cases.append(("docx:synthetic", 'docx', docx_path))
+    return cases
+
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def _peak_rss_mb():
+    # ru_maxrss: килобайты в Linux, байты в macOS
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _latency_metrics(latencies):
+    return {
+        'runs': len(latencies),
+        'mean': sum(latencies) / len(latencies),
+        'p50': _percentile(latencies, 0.5),
+        'p99': _percentile(latencies, 0.99),
+    }
+
+
+def _run_extractor_case(file_format, path, repeat):
+    # Выполняется в отдельном процессе, чтобы пиковая память относилась только к этому случаю
+    import importlib
+
+    module_name, function_name = EXTRACTORS[file_format]
+    extract = getattr(importlib.import_module(module_name), function_name)
+
+    latencies = []
+    text = ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        text = extract(path)
+        latencies.append(time.perf_counter() - started)
+    if not text:
+        return {'error': "экстрактор не вернул текст"}
+
+    metrics = _latency_metrics(latencies)
+    size_mb = os.path.getsize(path) / (1024 * 1024)
+    metrics['mb_per_s'] = size_mb / metrics['p50']
+    if file_format == 'pdf':
+        from parser.utils.pdf_extractor import _page_count
+
+        metrics['pages_per_s'] = _page_count(path) / metrics['p50']
+    metrics['chars'] = len(text)
+    metrics['peak_rss_mb'] = _peak_rss_mb()
+    return metrics
+
+
+def _run_analyzer_case(language, text, repeat):
+    from parser.utils.model_registry import registry
+    from parser.utils.text_analyzer import analyze_text
+
+    started = time.perf_counter()
+    try:
+        registry.get(language)
+    except OSError as e:
+        return {'error': f"модель не установлена: {e}"}
+    model_load = time.perf_counter() - started
+
+    latencies = []
+    tokens = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        tokens = analyze_text(text, language=language)
+        latencies.append(time.perf_counter() - started)
+
+    metrics = _latency_metrics(latencies)
+    metrics['model_load_s'] = model_load
+    metrics['tokens_per_s'] = len(tokens) / metrics['p50']
+    metrics['peak_rss_mb'] = _peak_rss_mb()
+    return metrics
+
+
+def _isolated(function, *args):
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        try:
+            return executor.submit(function, *args).result()
+        except Exception as e:
+            return {'error': str(e)}
+
+
+def run_benchmarks(repeat=5, synthetic=True, analyzer=True):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, file_format, path in build_corpus(directory, synthetic):
+            print(f"Замер {name}...", file=sys.stderr)
+            results[name] = _isolated(_run_extractor_case, file_format, path, repeat)
+
+    if analyzer:
+        texts = {
+            'ru': SENTENCE * 200,
+            'en': "The parser extracts text from documents and tags parts of speech. " * 200,
+        }
+        for language, text in texts.items():
+            name = f"analyze_text:{language}"
+            print(f"Замер {name}...", file=sys.stderr)
+            results[name] = _isolated(_run_analyzer_case, language, text, repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Список регрессий: (случай, метрика, базовое значение, текущее значение)
+    regressions = []
+    for name, base in baseline.items():
+        current = results.get(name)
+        if not current or 'error' in current or 'error' in base:
+            continue
+        for metric in LOWER_IS_BETTER + HIGHER_IS_BETTER:
+            base_value = base.get(metric)
+            value = current.get(metric)
+            if base_value is None or value is None:
+                continue
+            if metric in LOWER_IS_BETTER:
+                regressed = value > base_value * (1 + threshold)
+            else:
+                regressed = value < base_value * (1 - threshold)
+            if regressed:
+                regressions.append((name, metric, base_value, value))
+    return regressions
+
+
+def print_results(results):
+    print(f"{'Случай':<22} {'p50, с':>9} {'p99, с':>9} {'МБ/с':>9} {'стр/с':>9} {'ток/с':>9} {'RSS, МБ':>9}")
+    print("-" * 82)
+    for name, metrics in results.items():
+        if 'error' in metrics:
+            print(f"{name:<22} пропущен: {metrics['error']}")
+            continue
+        values = [metrics.get(key) for key in ('p50', 'p99', 'mb_per_s', 'pages_per_s', 'tokens_per_s', 'peak_rss_mb')]
+        print(f"{name:<22} " + ' '.join(f"{value:>9.3f}" if value is not None else f"{'-':>9}" for value in values))
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="Замеры скорости экстракторов и анализатора текста")
+    arg_parser.add_argument('-n', '--repeat', type=int, default=5, help="число повторов каждого замера")
+    arg_parser.add_argument('--no-synthetic', action='store_true', help="не создавать большие синтетические файлы")
+    arg_parser.add_argument('--no-analyzer', action='store_true', help="не замерять analyze_text")
+    arg_parser.add_argument('--save', help="сохранить результаты в JSON как базовые")
+    arg_parser.add_argument('--baseline', help="сравнить с базовыми результатами из JSON")
+    arg_parser.add_argument('--threshold', type=float, default=0.2,
+                            help="допустимое ухудшение относительно базовых результатов (0.2 = 20%%)")
+    args = arg_parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, not args.no_synthetic, not args.no_analyzer)
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, args.threshold)
+        for name, metric, base, current in regressions:
+            print(f"Регрессия {name}: {metric} {base:.4f} -> {current:.4f}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,22 @@
+import sys
+
+from parser import batch, index, service
+
+COMMANDS = {
+    'batch': batch.main,
+    'index': index.index_main,
+    'search': index.search_main,
+    'serve': service.main,
+}
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS:
+        print(f"Использование: python -m parser {{{','.join(COMMANDS)}}} ...", file=sys.stderr)
+        return 2
+    return COMMANDS[argv[0]](argv[1:])
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from parser.Exceptions import LanguageError
+from parser.utils.analysis_result import FIELDS
+from parser.utils.dispatcher import extract, sniff_format
+from parser.utils.text_analyzer import ANALYSIS_PROFILES, analyze_text
+
+
+def collect_files(inputs):
+    # Каталоги обходятся рекурсивно, шаблоны раскрываются через glob
+    files = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, names in os.walk(item):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names))
+        elif glob.has_magic(item):
+            files.extend(path for path in sorted(glob.glob(item, recursive=True)) if os.path.isfile(path))
+        elif os.path.isfile(item):
+            files.append(item)
+        else:
+            print(f"Файл не найден: {item}", file=sys.stderr)
+
+    seen = set()
+    unique = []
+    for path in files:
+        path = os.path.abspath(path)
+        if path not in seen:
+            seen.add(path)
+            unique.append(path)
+    return unique
+
+
+def file_key(path):
+    # Файл считается обработанным, пока не изменились его размер и время изменения
+    stat = os.stat(path)
+    return f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def load_manifest(checkpoint, retry_errors=False):
+    # Ключи обработанных файлов; с retry_errors файлы, обработка которых
+    # последний раз завершилась ошибкой, обрабатываются заново
+    status = {}
+    if checkpoint and os.path.exists(checkpoint):
+        with open(checkpoint, encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    entry = json.loads(line)
+                    status[entry['key']] = entry.get('error', False)
+    return {key for key, error in status.items() if not (retry_errors and error)}
+
+
+def process_file(path, profile='full', columnar=False):
+    record = {'path': path}
+    try:
+        record['format'] = sniff_format(path)
+        text = extract(path)
+        if not text:
+            record['error'] = "Не удалось извлечь текст"
+            return record
+        record['chars'] = len(text)
+
+        tokens = analyze_text(text, profile=profile, compact=True)
+        record['token_count'] = len(tokens)
+        if columnar:
+            record['tokens'] = {field: [tokens.strings[i] for i in tokens.columns[field]] for field in FIELDS}
+        else:
+            record['tokens'] = tokens.to_list()
+    except LanguageError as e:
+        record['error'] = e.message
+    except Exception as e:
+        record['error'] = str(e)
+    return record
+
+
+def _process_isolated(path, profile, columnar):
+    # Файл обрабатывается в отдельном пуле из одного процесса:
+    # если пул сломается, виновник известен точно
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(process_file, path, profile, columnar).result()
+        except BrokenProcessPool:
+            return {'path': path, 'error': "Процесс обработки аварийно завершился"}
+        except Exception as e:
+            return {'path': path, 'error': str(e)}
+
+
+def _process_pool(pending, workers, profile, columnar):
+    # В работе не больше 2 * workers файлов, чтобы при аварии процесса-обработчика
+    # (например, падении PyMuPDF на испорченном PDF) под подозрением было мало файлов.
+    # Возвращает файлы, обрабатывавшиеся в момент аварии
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            while pending and len(running) < 2 * workers:
+                path = pending.popleft()
+                running[executor.submit(process_file, path, profile, columnar)] = path
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            broken = False
+            for future in done:
+                path = running.pop(future)
+                try:
+                    record = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    running[future] = path
+                    continue
+                except Exception as e:
+                    record = {'path': path, 'error': str(e)}
+                yield record
+            if broken:
+                return list(running.values())
+    return []
+
+
+def _process_all(paths, workers, profile, columnar):
+    if workers == 1:
+        for path in paths:
+            yield process_file(path, profile, columnar)
+        return
+
+    pending = deque(paths)
+    while pending:
+        suspects = yield from _process_pool(pending, workers, profile, columnar)
+        # После аварии пул создаётся заново, а подозреваемые файлы
+        # проверяются по одному, чтобы ошибка записалась только для виновника
+        for path in suspects:
+            yield _process_isolated(path, profile, columnar)
+
+
+def run_batch(inputs, output, workers=1, checkpoint=None, profile='full', columnar=False, progress=True,
+              retry_errors=False):
+    files = collect_files(inputs)
+    done = load_manifest(checkpoint, retry_errors)
+    keys = {path: file_key(path) for path in files}
+    pending = [path for path in files if keys[path] not in done]
+
+    summary = {'total': len(files), 'skipped': len(files) - len(pending), 'processed': 0, 'errors': 0}
+    started = time.monotonic()
+    manifest = open(checkpoint, 'a', encoding='utf-8') if checkpoint else None
+    try:
+        with open(output, 'a', encoding='utf-8') as out:
+            for record in _process_all(pending, workers, profile, columnar):
+                out.write(json.dumps(record, ensure_ascii=False) + '\n')
+                out.flush()
+                if manifest is not None:
+                    # Отметка в манифесте пишется только после записи результата
+                    manifest.write(json.dumps({'key': keys[record['path']], 'error': 'error' in record}) + '\n')
+                    manifest.flush()
+
+                summary['processed'] += 1
+                if 'error' in record:
+                    summary['errors'] += 1
+                if progress:
+                    elapsed = time.monotonic() - started
+                    print(f"[{summary['processed']}/{len(pending)}] {elapsed:.1f} с "
+                          f"{record['path']}{' — ошибка' if 'error' in record else ''}", file=sys.stderr)
+    finally:
+        if manifest is not None:
+            manifest.close()
+    return summary
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m parser batch',
+        description="Пакетное извлечение и анализ текста из файлов",
+    )
+    arg_parser.add_argument('inputs', nargs='+', help="файлы, каталоги или шаблоны glob")
+    arg_parser.add_argument('-o', '--output', required=True, help="файл результатов JSONL")
+    arg_parser.add_argument('-w', '--workers', type=int, default=os.cpu_count() or 1, help="число процессов")
+    arg_parser.add_argument('-c', '--checkpoint', help="манифест обработанных файлов для продолжения работы")
+    arg_parser.add_argument('--retry-errors', action='store_true',
+                            help="заново обработать файлы, отмеченные в манифесте как ошибочные")
+    arg_parser.add_argument('-p', '--profile', default='full', choices=sorted(ANALYSIS_PROFILES),
+                            help="профиль анализа")
+    arg_parser.add_argument('--columnar', action='store_true',
+                            help="записывать токены по столбцам, а не списком словарей")
+    arg_parser.add_argument('-q', '--quiet', action='store_true', help="не выводить ход обработки")
+    args = arg_parser.parse_args(argv)
+
+    if args.workers < 1:
+        arg_parser.error("число процессов должно быть больше 0")
+
+    summary = run_batch(
+        args.inputs,
+        args.output,
+        workers=args.workers,
+        checkpoint=args.checkpoint,
+        profile=args.profile,
+        columnar=args.columnar,
+        progress=not args.quiet,
+        retry_errors=args.retry_errors,
+    )
+    print(f"Всего файлов: {summary['total']}, обработано: {summary['processed']}, "
+          f"пропущено: {summary['skipped']}, с ошибками: {summary['errors']}", file=sys.stderr)
+    return 1 if summary['errors'] else 0
@@ -1,3 +1,3 @@
-from parser.utils.djvu_extractor import extract_text_from_djvu
+from parser.utils.djvu_extractor import extract_text_from_djvu, extract_texts_from_djvu, iter_djvu_pages
 
-__all__ = ['extract_text_from_djvu'] 
\ No newline at end of file
+__all__ = ['extract_text_from_djvu', 'extract_texts_from_djvu', 'iter_djvu_pages'] 
@@ -1,3 +1,3 @@
-from parser.utils.doc_extractor import extract_text_from_doc
+from parser.utils.doc_extractor import extract_text_from_doc, extract_texts_from_doc
 
-__all__ = ['extract_text_from_doc'] 
\ No newline at end of file
+__all__ = ['extract_text_from_doc', 'extract_texts_from_doc'] 
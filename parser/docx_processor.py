@@ -1,3 +1,3 @@
-from parser.utils.docx_extractor import extract_text_from_docx
+from parser.utils.docx_extractor import extract_text_from_docx, iter_docx_paragraphs
 
-__all__ = ['extract_text_from_docx'] 
\ No newline at end of file
+__all__ = ['extract_text_from_docx', 'iter_docx_paragraphs'] 
\ No newline at end of file
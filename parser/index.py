@@ -0,0 +1,71 @@
+import argparse
+import json
+import sys
+
+from parser.utils.analysis_result import FIELDS
+from parser.utils.inverted_index import POS_TAGS, InvertedIndex
+
+
+def record_tokens(record):
+    # Токены записи результата пакетной обработки: списком словарей или по столбцам
+    tokens = record.get('tokens') or []
+    if isinstance(tokens, dict):
+        return [dict(zip(FIELDS, values)) for values in zip(*(tokens[field] for field in FIELDS))]
+    return tokens
+
+
+def index_results(index, results_path):
+    # Добавляет в индекс документы из JSONL-файла команды batch; записи с ошибками пропускаются
+    added = 0
+    with open(results_path, encoding='utf-8') as file:
+        for line in file:
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if 'error' in record:
+                continue
+            index.add_document(record['path'], record_tokens(record))
+            added += 1
+    return added
+
+
+def index_main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m parser index',
+        description="Добавление результатов пакетной обработки в обратный индекс по леммам",
+    )
+    arg_parser.add_argument('directory', help="каталог индекса")
+    arg_parser.add_argument('results', nargs='+', help="файлы JSONL, записанные командой batch")
+    arg_parser.add_argument('--merge', action='store_true', help="слить все сегменты в один")
+    args = arg_parser.parse_args(argv)
+
+    with InvertedIndex(args.directory) as index:
+        added = sum(index_results(index, path) for path in args.results)
+        index.commit()
+        if args.merge:
+            index.merge()
+        print(f"Добавлено документов: {added}, всего в индексе: {len(index)}, "
+              f"сегментов: {index.segment_count()}", file=sys.stderr)
+    return 0
+
+
+def search_main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m parser search',
+        description="Поиск документов по леммам в обратном индексе",
+    )
+    arg_parser.add_argument('directory', help="каталог индекса")
+    arg_parser.add_argument('lemmas', nargs='+', help="леммы для поиска")
+    arg_parser.add_argument('--phrase', action='store_true', help="леммы должны идти подряд")
+    arg_parser.add_argument('--pos', choices=POS_TAGS, help="часть речи найденных лемм")
+    args = arg_parser.parse_args(argv)
+
+    with InvertedIndex(args.directory) as index:
+        if args.phrase:
+            found = index.phrase(args.lemmas, pos=args.pos)
+        else:
+            found = index.search_all(args.lemmas, pos=args.pos)
+    for key in found:
+        print(key)
+    return 0 if found else 1
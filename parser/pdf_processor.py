@@ -1,3 +1,3 @@
-from parser.utils.pdf_extractor import extract_text_from_pdf
+from parser.utils.pdf_extractor import extract_text_from_pdf, iter_pdf_pages
 
-__all__ = ['extract_text_from_pdf'] 
\ No newline at end of file
+__all__ = ['extract_text_from_pdf', 'iter_pdf_pages'] 
@@ -0,0 +1,280 @@
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from parser.Exceptions import LanguageError
+from parser.utils import metrics
+from parser.utils.dispatcher import extract, sniff_format
+from parser.utils.model_registry import MODELS, preload_models
+from parser.utils.text_analyzer import ANALYSIS_PROFILES, analyze_texts
+
+_STOP = object()
+
+
+class QueueFull(Exception):
+    pass
+
+
+class MicroBatcher:
+    # Собирает запросы, пришедшие одновременно из разных потоков, в пакеты:
+    # пакет отправляется, когда в нём max_batch_size элементов или с момента
+    # первого элемента прошло max_wait секунд. Очередь ограничена max_queue,
+    # при переполнении submit сразу выбрасывает QueueFull
+    def __init__(self, process_batch, max_batch_size=32, max_wait=0.01, max_queue=1024, name='service'):
+        if max_batch_size < 1 or max_queue < 1 or max_wait < 0:
+            raise ValueError("max_batch_size и max_queue должны быть больше 0, max_wait — не меньше 0")
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name=f'{name}-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        future = Future()
+        try:
+            self._queue.put_nowait((item, future))
+        except queue.Full:
+            metrics.increment(f'{self.name}.rejected')
+            raise QueueFull("Очередь запросов переполнена") from None
+        metrics.set_gauge(f'{self.name}.queue_depth', self._queue.qsize())
+        return future
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def close(self):
+        # Запросы, поставленные в очередь до закрытия, будут обработаны
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _STOP:
+                return batch, True
+            batch.append(entry)
+        return batch, False
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            entry = self._queue.get()
+            if entry is _STOP:
+                break
+            batch, stopped = self._collect(entry)
+            metrics.set_gauge(f'{self.name}.queue_depth', self._queue.qsize())
+            metrics.observe_value(f'{self.name}.batch_size', len(batch))
+
+            # Отменённые клиентом запросы не обрабатываются
+            batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.process_batch([item for item, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def analyze_batch(requests):
+    # requests — список (text, profile, language). Тексты с одинаковым профилем
+    # и языком анализируются одним вызовом nlp.pipe; ошибка одного текста
+    # возвращается как его результат и не затрагивает другие запросы
+    results = [None] * len(requests)
+    groups = {}
+    for index, (text, profile, language) in enumerate(requests):
+        groups.setdefault((profile, language), []).append((index, text))
+
+    for (profile, language), items in groups.items():
+        texts = [text for _, text in items]
+        try:
+            analyzed = list(analyze_texts(texts, batch_size=len(texts), profile=profile, language=language,
+                                          errors='return'))
+        except Exception as e:
+            analyzed = [e] * len(items)
+        for (index, _), tokens in zip(items, analyzed):
+            results[index] = tokens
+    return results
+
+
+class ServiceError(Exception):
+    def __init__(self, status, message):
+        self.status = status
+        self.message = message
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = 'ParserService/1.0'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > self.server.max_body:
+            raise ServiceError(413, f"Размер запроса превышает {self.server.max_body} байт")
+        return self.rfile.read(length)
+
+    def _analyze(self, text, profile, language):
+        if not isinstance(text, str):
+            raise ServiceError(400, "Поле 'text' должно быть строкой")
+        if profile not in ANALYSIS_PROFILES:
+            raise ServiceError(400, f"Неизвестный профиль анализа: '{profile}'")
+        if language is not None and language not in MODELS:
+            raise ServiceError(400, f"Язык '{language}' не поддерживается")
+        future = self.server.batcher.submit((text, profile, language))
+        try:
+            return future.result(timeout=self.server.request_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise ServiceError(504, "Превышено время ожидания анализа") from None
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/metrics':
+            body = metrics.registry.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif path == '/health':
+            self._send_json(200, {'status': 'ok', 'queue_depth': self.server.batcher.queue_depth()})
+        else:
+            self._send_json(404, {'error': "Неизвестный адрес"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        try:
+            if url.path == '/analyze':
+                payload = self._handle_analyze()
+            elif url.path == '/extract':
+                payload = self._handle_extract(parse_qs(url.query))
+            else:
+                raise ServiceError(404, "Неизвестный адрес")
+        except QueueFull as e:
+            self._send_json(503, {'error': str(e)}, headers=[('Retry-After', '1')])
+        except ServiceError as e:
+            self._send_json(e.status, {'error': e.message})
+        except LanguageError as e:
+            self._send_json(422, {'error': e.message})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+        else:
+            self._send_json(200, payload)
+
+    def _handle_analyze(self):
+        try:
+            request = json.loads(self._read_body())
+        except ValueError:
+            raise ServiceError(400, "Тело запроса должно быть JSON-объектом") from None
+        if not isinstance(request, dict):
+            raise ServiceError(400, "Тело запроса должно быть JSON-объектом")
+        tokens = self._analyze(request.get('text'), request.get('profile', 'full'), request.get('language'))
+        return {'tokens': tokens}
+
+    def _handle_extract(self, query):
+        content = self._read_body()
+        # Извлечение не пакетируется, но число одновременных извлечений ограничено
+        if not self.server.extract_slots.acquire(blocking=False):
+            metrics.increment('service.extract_rejected')
+            raise QueueFull("Слишком много одновременных запросов на извлечение")
+        try:
+            file_format = sniff_format(content)
+            if file_format is None:
+                raise ServiceError(415, "Неизвестный формат файла")
+            with metrics.timer('service.extract'):
+                text = extract(content)
+        finally:
+            self.server.extract_slots.release()
+        if not text:
+            raise ServiceError(422, "Не удалось извлечь текст")
+
+        payload = {'format': file_format, 'text': text}
+        if query.get('analyze', ['0'])[0] in ('1', 'true'):
+            profile = query.get('profile', ['full'])[0]
+            language = query.get('language', [None])[0]
+            payload['tokens'] = self._analyze(text, profile, language)
+        return payload
+
+
+def make_server(host='127.0.0.1', port=8000, max_batch_size=32, max_wait=0.01, max_queue=1024,
+                max_extract=4, max_body=64 * 1024 * 1024, request_timeout=60.0, verbose=False):
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.batcher = MicroBatcher(analyze_batch, max_batch_size, max_wait, max_queue)
+    server.extract_slots = threading.BoundedSemaphore(max_extract)
+    server.max_body = max_body
+    server.request_timeout = request_timeout
+    server.verbose = verbose
+    return server
+
+
+def close_server(server):
+    server.server_close()
+    server.batcher.close()
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(
+        prog='python -m parser serve',
+        description="HTTP-сервис извлечения и анализа текста с пакетной обработкой запросов",
+    )
+    arg_parser.add_argument('--host', default='127.0.0.1', help="адрес для подключений")
+    arg_parser.add_argument('--port', type=int, default=8000, help="порт")
+    arg_parser.add_argument('--languages', nargs='*', default=sorted(MODELS),
+                            help="модели spaCy, загружаемые при запуске")
+    arg_parser.add_argument('--max-batch-size', type=int, default=32, help="наибольший размер пакета")
+    arg_parser.add_argument('--max-wait', type=float, default=0.01,
+                            help="наибольшее ожидание заполнения пакета, с")
+    arg_parser.add_argument('--max-queue', type=int, default=1024,
+                            help="длина очереди, после которой запросы отклоняются с кодом 503")
+    arg_parser.add_argument('--max-extract', type=int, default=4,
+                            help="число одновременных запросов на извлечение")
+    arg_parser.add_argument('-v', '--verbose', action='store_true', help="журналировать каждый запрос")
+    args = arg_parser.parse_args(argv)
+
+    if args.max_batch_size < 1 or args.max_queue < 1 or args.max_extract < 1:
+        arg_parser.error("размеры пакета, очереди и число извлечений должны быть больше 0")
+
+    metrics.enable()
+    preload_models(args.languages)
+    server = make_server(args.host, args.port, args.max_batch_size, args.max_wait, args.max_queue,
+                         args.max_extract, verbose=args.verbose)
+    print(f"Сервис запущен на http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_server(server)
+    return 0
@@ -1,3 +1,19 @@
-from parser.utils.text_analyzer import analyze_text
+from parser.utils.text_analyzer import (
+    analyze_text,
+    analyze_text_by_paragraph,
+    analyze_text_chunked,
+    analyze_texts,
+    detect_language,
+)
+from parser.utils.incremental import analyze_text_incremental
+from parser.utils.model_registry import preload_models
 
-__all__ = ['analyze_text'] 
\ No newline at end of file
+__all__ = [
+    'analyze_text',
+    'analyze_text_by_paragraph',
+    'analyze_text_chunked',
+    'analyze_text_incremental',
+    'analyze_texts',
+    'detect_language',
+    'preload_models',
+]
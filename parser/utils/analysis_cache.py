@@ -0,0 +1,82 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from parser.utils.analysis_result import TokenTable
+
+_cache = None
+
+
+def set_analysis_cache(cache):
+    # Включает кэш результатов analyze_text / analyze_texts (None — выключает)
+    global _cache
+    _cache = cache
+
+
+def get_analysis_cache():
+    return _cache
+
+
+def analysis_key(text, language, nlp, profile):
+    # Результат зависит от нормализованного текста, языка, модели и её версии,
+    # а также от профиля анализа
+    meta = nlp.meta
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    return f"{language}:{meta.get('name')}:{meta.get('version')}:{profile}:{digest}"
+
+
+class AnalysisCache:
+    # LRU-кэш в памяти на max_entries результатов; store (например, SqliteCacheStore)
+    # сохраняет результаты между запусками
+    def __init__(self, max_entries=1024, store=None):
+        if max_entries < 1:
+            raise ValueError("max_entries должен быть больше 0")
+        self.max_entries = max_entries
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            table = self._entries.get(key)
+            if table is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return table
+
+        if self.store is not None:
+            data = self.store.get(key)
+            if data is not None:
+                table = TokenTable.from_bytes(data)
+                with self._lock:
+                    self._remember(key, table)
+                    self.hits += 1
+                return table
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, table):
+        with self._lock:
+            self._remember(key, table)
+        if self.store is not None:
+            self.store.put(key, table.to_bytes())
+
+    def _remember(self, key, table):
+        self._entries[key] = table
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self.store is not None:
+            self.store.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
@@ -0,0 +1,135 @@
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+
+# Поля результата анализа в том же виде, что и у словарей analyze_text
+FIELDS = ('text', 'lemma', 'position', 'dependency')
+
+_MAGIC = b'PTT1'
+_HEADER = struct.Struct('<4sII')
+
+
+class TokenView(Mapping):
+    # Представление одного токена в виде словаря без создания dict
+    __slots__ = ('_table', '_index')
+
+    def __init__(self, table, index):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        try:
+            column = self._table.columns[key]
+        except KeyError:
+            raise KeyError(key) from None
+        return self._table.strings[column[self._index]]
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self):
+        return len(FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class TokenTable:
+    # Компактный результат анализа: общая таблица строк и массивы
+    # целочисленных идентификаторов для каждого поля токена
+    def __init__(self):
+        self.strings = []
+        self._ids = {}
+        self.columns = {field: array('I') for field in FIELDS}
+
+    @classmethod
+    def from_doc(cls, doc):
+        table = cls()
+        for token in doc:
+            table.append(token.text, token.lemma_, token.pos_, token.dep_)
+        return table
+
+    @classmethod
+    def from_tokens(cls, tokens):
+        table = cls()
+        for token in tokens:
+            table.append(*(token[field] for field in FIELDS))
+        return table
+
+    def append(self, text, lemma, position, dependency):
+        for field, value in zip(FIELDS, (text, lemma, position, dependency)):
+            self.columns[field].append(self._intern(value))
+
+    def _intern(self, value):
+        string_id = self._ids.get(value)
+        if string_id is None:
+            string_id = len(self.strings)
+            self._ids[value] = string_id
+            self.strings.append(value)
+        return string_id
+
+    def __len__(self):
+        return len(self.columns['text'])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [TokenView(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("индекс токена вне диапазона")
+        return TokenView(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield TokenView(self, index)
+
+    def __eq__(self, other):
+        if not isinstance(other, TokenTable):
+            return NotImplemented
+        return self.to_list() == other.to_list()
+
+    def to_list(self):
+        return [dict(token) for token in self]
+
+    def to_bytes(self):
+        encoded = [string.encode('utf-8') for string in self.strings]
+        lengths = array('I', (len(string) for string in encoded))
+        parts = [_HEADER.pack(_MAGIC, len(self.strings), len(self)), _to_le_bytes(lengths), b''.join(encoded)]
+        for field in FIELDS:
+            parts.append(_to_le_bytes(self.columns[field]))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = memoryview(data)
+        magic, string_count, token_count = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Некорректный формат результата анализа")
+        offset = _HEADER.size
+
+        lengths, offset = _read_array(data, offset, string_count)
+        table = cls()
+        for length in lengths:
+            table._intern(str(data[offset:offset + length], 'utf-8'))
+            offset += length
+        for field in FIELDS:
+            table.columns[field], offset = _read_array(data, offset, token_count)
+        return table
+
+
+def _to_le_bytes(values):
+    if sys.byteorder == 'big':
+        values = array('I', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _read_array(data, offset, count):
+    values = array('I')
+    end = offset + count * values.itemsize
+    values.frombytes(data[offset:end])
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values, end
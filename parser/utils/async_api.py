@@ -0,0 +1,113 @@
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from parser.utils.dispatcher import extract
+from parser.utils.djvu_extractor import extract_text_from_djvu
+from parser.utils.doc_extractor import extract_text_from_doc
+from parser.utils.docx_extractor import extract_text_from_docx
+from parser.utils.extraction_cache import cached_extraction
+from parser.utils.html_crawler import HtmlCrawler
+from parser.utils.pdf_extractor import extract_text_from_pdf
+from parser.utils.sources import tool_input
+from parser.utils.subprocess_pool import get_tool_pool, tool_text
+from parser.utils.text_analyzer import analyze_text, analyze_texts
+
+# Исполнители для работы, блокирующей цикл событий: 'extract' — извлечение текста,
+# 'analyze' — анализ spaCy. Раздельные пулы не дают большим документам занять
+# все потоки, нужные анализу, и наоборот
+EXECUTOR_KINDS = ('extract', 'analyze')
+
+_executors = {}
+_lock = threading.Lock()
+
+
+def configure_executor(kind, executor):
+    # executor — ThreadPoolExecutor или ProcessPoolExecutor (None — пул потоков по умолчанию).
+    # В пуле процессов задачу, уже начавшую выполняться, можно только дождаться,
+    # зато тяжёлый PDF не удерживает GIL основного процесса
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Неизвестный вид исполнителя: '{kind}'")
+    with _lock:
+        _executors[kind] = executor
+
+
+def get_executor(kind):
+    if kind not in EXECUTOR_KINDS:
+        raise ValueError(f"Неизвестный вид исполнителя: '{kind}'")
+    with _lock:
+        executor = _executors.get(kind)
+        if executor is None:
+            workers = min(4, os.cpu_count() or 1)
+            executor = _executors[kind] = ThreadPoolExecutor(max_workers=workers,
+                                                             thread_name_prefix=f'parser-{kind}')
+        return executor
+
+
+async def run_blocking(kind, function, *args, timeout=None, **kwargs):
+    # Выполняет блокирующую функцию в исполнителе нужного вида. При отмене или тайм-ауте
+    # ожидающая корутина сразу освобождается (asyncio.TimeoutError / CancelledError),
+    # задача, ещё не начавшая выполняться, снимается с очереди исполнителя
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(get_executor(kind), functools.partial(function, *args, **kwargs))
+    return await asyncio.wait_for(future, timeout)
+
+
+async def aextract_text_from_pdf(file_path, timeout=None, **kwargs):
+    return await run_blocking('extract', extract_text_from_pdf, file_path, timeout=timeout, **kwargs)
+
+
+async def aextract_text_from_docx(file_path, timeout=None, **kwargs):
+    return await run_blocking('extract', extract_text_from_docx, file_path, timeout=timeout, **kwargs)
+
+
+async def aextract(source, timeout=None):
+    return await run_blocking('extract', extract, source, timeout=timeout)
+
+
+async def _run_tool(tool, source, label, timeout, pool):
+    # Внешняя утилита запускается асинхронным подпроцессом; при отмене
+    # или тайм-ауте ToolPool завершает процесс и отбрасывает остаток его вывода,
+    # поэтому вызывающий освобождается сразу, даже если утилита ещё писала
+    pool = pool or get_tool_pool()
+    with tool_input(source, f'.{label.lower()}') as (path, pass_fds):
+        result = await asyncio.wait_for(pool.run([tool, path], pass_fds=pass_fds), timeout)
+    return tool_text(result, label)
+
+
+# Записи кэша общие с синхронными экстракторами
+@cached_extraction(*extract_text_from_doc.cache_namespace)
+async def aextract_text_from_doc(file_path, timeout=None, pool=None):
+    return await _run_tool('antiword', file_path, 'DOC', timeout, pool)
+
+
+@cached_extraction(*extract_text_from_djvu.cache_namespace)
+async def aextract_text_from_djvu(file_path, timeout=None, pool=None):
+    return await _run_tool('djvutxt', file_path, 'DJVU', timeout, pool)
+
+
+async def afetch_html_text(url, backend='html.parser', timeout=10.0, crawler=None):
+    # Текст абзацев страницы; при ошибке загрузки или разбора — пустая строка
+    if crawler is None:
+        async with HtmlCrawler(timeout=timeout, backend=backend) as own_crawler:
+            result = await own_crawler.fetch(url)
+    else:
+        result = await crawler.fetch(url)
+    if result.error:
+        print(result.error)
+        return ""
+    return result.text
+
+
+async def aanalyze_text(text, timeout=None, **kwargs):
+    return await run_blocking('analyze', analyze_text, text, timeout=timeout, **kwargs)
+
+
+def _analyze_list(texts, **kwargs):
+    return list(analyze_texts(texts, **kwargs))
+
+
+async def aanalyze_texts(texts, timeout=None, **kwargs):
+    return await run_blocking('analyze', _analyze_list, list(texts), timeout=timeout, **kwargs)
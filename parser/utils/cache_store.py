@@ -0,0 +1,93 @@
+import os
+import sqlite3
+import threading
+
+
+class SqliteCacheStore:
+    # Хранилище «ключ → байты» в SQLite с вытеснением давно не использованных
+    # записей, когда общий объём превышает max_bytes
+    def __init__(self, path, max_bytes=None):
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes должен быть больше 0")
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS entries ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                'size INTEGER NOT NULL, accessed INTEGER NOT NULL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)')
+        self._total, self._clock = self._connection.execute(
+            'SELECT COALESCE(SUM(size), 0), COALESCE(MAX(accessed), 0) FROM entries'
+        ).fetchone()
+
+    def _tick(self):
+        # Счётчик обращений задаёт порядок LRU надёжнее, чем время
+        self._clock += 1
+        return self._clock
+
+    def get(self, key):
+        with self._lock:
+            row = self._connection.execute('SELECT value FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            with self._connection:
+                self._connection.execute('UPDATE entries SET accessed = ? WHERE key = ?', (self._tick(), key))
+            self.hits += 1
+            return bytes(row[0])
+
+    def put(self, key, value):
+        size = len(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        with self._lock, self._connection:
+            row = self._connection.execute('SELECT size FROM entries WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                self._total -= row[0]
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)',
+                (key, value, size, self._tick()),
+            )
+            self._total += size
+            self._evict()
+
+    def _evict(self):
+        if self.max_bytes is None:
+            return
+        while self._total > self.max_bytes:
+            key, size = self._connection.execute(
+                'SELECT key, size FROM entries ORDER BY accessed LIMIT 1'
+            ).fetchone()
+            self._connection.execute('DELETE FROM entries WHERE key = ?', (key,))
+            self._total -= size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock, self._connection:
+            self._connection.execute('DELETE FROM entries')
+            self._total = 0
+
+    def stats(self):
+        with self._lock:
+            count = self._connection.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': count,
+                'bytes': self._total,
+            }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
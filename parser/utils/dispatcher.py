@@ -0,0 +1,135 @@
+import os
+import tempfile
+import zipfile
+from collections import namedtuple
+from contextlib import contextmanager
+
+from parser.utils.pdf_extractor import extract_text_from_pdf
+from parser.utils.docx_extractor import extract_text_from_docx
+from parser.utils.doc_extractor import extract_text_from_doc
+from parser.utils.djvu_extractor import extract_text_from_djvu
+from parser.utils.sources import BufferReader, as_buffer, is_path
+
+# Формат документа: имя, функция распознавания по первым байтам и экстрактор.
+# sniff(header, source) получает начало файла и сам источник (путь или байты)
+# для форматов, которые нельзя распознать только по сигнатуре.
+# buffers=True — экстрактор принимает байты сам, иначе они записываются во временный файл.
+Format = namedtuple('Format', ['name', 'sniff', 'extract', 'suffix', 'buffers'])
+
+# Сколько байт начала файла читается для распознавания формата
+HEADER_SIZE = 4096
+
+_formats = []
+
+
+def register_format(name, sniff, extract, suffix='', first=False, buffers=False):
+    # first=True ставит формат перед встроенными, например чтобы переопределить их
+    unregister_format(name)
+    entry = Format(name, sniff, extract, suffix, buffers)
+    if first:
+        _formats.insert(0, entry)
+    else:
+        _formats.append(entry)
+
+
+def unregister_format(name):
+    _formats[:] = [entry for entry in _formats if entry.name != name]
+
+
+def registered_formats():
+    return [entry.name for entry in _formats]
+
+
+@contextmanager
+def _open_source(source):
+    if is_path(source):
+        with open(source, 'rb') as file:
+            yield file
+    else:
+        yield BufferReader(source)
+
+
+def _read_header(source):
+    with _open_source(source) as file:
+        return file.read(HEADER_SIZE)
+
+
+def _sniff_pdf(header, source):
+    # Сигнатура может находиться не в самом начале файла
+    return b'%PDF-' in header[:1024]
+
+
+def _sniff_doc(header, source):
+    # Составной документ OLE2 (Word 97-2003)
+    return header.startswith(b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1')
+
+
+def _sniff_djvu(header, source):
+    return header.startswith(b'AT&TFORM') and header[12:15] == b'DJV'
+
+
+def _sniff_docx(header, source):
+    # DOCX — это zip-архив, в котором есть word/document.xml;
+    # прочие zip-архивы не распознаются
+    if not header.startswith(b'PK\x03\x04'):
+        return False
+    try:
+        with _open_source(source) as file, zipfile.ZipFile(file) as archive:
+            archive.getinfo('word/document.xml')
+        return True
+    except (KeyError, zipfile.BadZipFile):
+        return False
+
+
+def sniff_format(source):
+    if not is_path(source):
+        source = as_buffer(source)
+    header = _read_header(source)
+    for entry in _formats:
+        if entry.sniff(header, source):
+            return entry.name
+    return None
+
+
+@contextmanager
+def _as_path(source, suffix):
+    # Для сторонних экстракторов, принимающих только путь к файлу,
+    # байты временно записываются на диск
+    if is_path(source):
+        yield source
+        return
+    file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+    try:
+        with file:
+            file.write(source)
+        yield file.name
+    finally:
+        os.unlink(file.name)
+
+
+def extract(source):
+    # Единая точка входа: формат определяется по содержимому, а не по расширению.
+    # source — путь, байты, memoryview или двоичный файловый объект
+    try:
+        if not is_path(source):
+            source = as_buffer(source)
+        name = sniff_format(source)
+    except Exception as e:
+        print(f"Ошибка при чтении файла: {e}")
+        return None
+
+    if name is None:
+        print("Неизвестный формат файла")
+        return None
+
+    entry = next(entry for entry in _formats if entry.name == name)
+    if entry.buffers:
+        return entry.extract(source)
+    with _as_path(source, entry.suffix) as path:
+        return entry.extract(path)
+
+
+register_format('pdf', _sniff_pdf, extract_text_from_pdf, '.pdf', buffers=True)
+register_format('docx', _sniff_docx, extract_text_from_docx, '.docx', buffers=True)
+register_format('doc', _sniff_doc, extract_text_from_doc, '.doc', buffers=True)
+register_format('djvu', _sniff_djvu, extract_text_from_djvu, '.djvu', buffers=True)
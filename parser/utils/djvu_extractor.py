@@ -1,11 +1,63 @@
-import subprocess
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
-def extract_text_from_djvu(file_path):
+from parser.utils import metrics
+from parser.utils.extraction_cache import cached_extraction
+from parser.utils.sources import run_tool, tool_input
+
+# Страница DJVU: номер (с нуля) и её текст
+DjvuPage = namedtuple('DjvuPage', ['number', 'text'])
+
+
+def _run_djvutxt(file_path, page_num=None, pass_fds=()):
+    # Текст читается из stdout djvutxt, без промежуточного файла
+    args = ['djvutxt']
+    if page_num is not None:
+        args.append(f'--page={page_num + 1}')
+    args.append(file_path)
+    with metrics.timer('djvutxt'):
+        return run_tool(args, pass_fds).decode('utf-8')
+
+
+def _page_count(file_path, pass_fds=()):
+    return int(run_tool(['djvused', '-e', 'n', file_path], pass_fds).decode('utf-8').strip())
+
+
+def djvu_page_count(file_path):
+    with tool_input(file_path, '.djvu') as (path, pass_fds):
+        return _page_count(path, pass_fds)
+
+
+def iter_djvu_pages(file_path):
+    with tool_input(file_path, '.djvu') as (path, pass_fds):
+        for page_num in range(_page_count(path, pass_fds)):
+            yield DjvuPage(page_num, _run_djvutxt(path, page_num, pass_fds))
+
+
+def _extract_text_parallel(file_path, workers, pass_fds=()):
+    # Каждая страница извлекается отдельным процессом djvutxt,
+    # поэтому для распараллеливания достаточно пула потоков
+    page_count = _page_count(file_path, pass_fds)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return ''.join(executor.map(lambda page_num: _run_djvutxt(file_path, page_num, pass_fds),
+                                    range(page_count)))
+
+
+@cached_extraction('djvu', version=1)
+def extract_text_from_djvu(file_path, workers=1):
     try:
-        result = subprocess.run(['djvutxt', file_path, 'output.txt'], stdout=subprocess.PIPE, check=True)
-        with open('output.txt', 'r') as file:
-            text = file.read()
-        return text
+        if workers < 1:
+            raise ValueError("workers должен быть больше 0")
+        with tool_input(file_path, '.djvu') as (path, pass_fds):
+            if workers > 1:
+                return _extract_text_parallel(path, workers, pass_fds)
+            return _run_djvutxt(path, pass_fds=pass_fds)
     except Exception as e:
         print(f"Ошибка при чтении DJVU: {e}")
         return ""
+
+
+def extract_texts_from_djvu(file_paths, pool=None):
+    from parser.utils.subprocess_pool import extract_many
+
+    return extract_many('djvutxt', 'DJVU', file_paths, pool)
@@ -1,9 +1,20 @@
-import subprocess
+from parser.utils import metrics
+from parser.utils.extraction_cache import cached_extraction
+from parser.utils.sources import run_tool, tool_input
 
+
+@cached_extraction('doc', version=1)
 def extract_text_from_doc(file_path):
     try:
-        result = subprocess.run(['antiword', file_path], stdout=subprocess.PIPE, check=True)
-        return result.stdout.decode('utf-8')
+        with tool_input(file_path, '.doc') as (path, pass_fds), metrics.timer('antiword'):
+            output = run_tool(['antiword', path], pass_fds)
+        return output.decode('utf-8')
     except Exception as e:
         print(f"Ошибка при чтении DOC: {e}")
         return ""
+
+
+def extract_texts_from_doc(file_paths, pool=None):
+    from parser.utils.subprocess_pool import extract_many
+
+    return extract_many('antiword', 'DOC', file_paths, pool)
@@ -1,8 +1,140 @@
-from docx import Document
+import posixpath
+import re
+import zipfile
+from xml.etree import ElementTree
 
-def extract_text_from_docx(file_path):
+from parser.utils import metrics
+from parser.utils.extraction_cache import cached_extraction
+from parser.utils.lazy_import import lazy_import
+from parser.utils.sources import as_file
+
+docx = lazy_import('docx')
+
+_W = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+# Word хранит надпись дважды: в mc:Choice и в mc:Fallback для старых версий;
+# текст берётся только из mc:Choice
+_MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+_OFFICE_DOCUMENT = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument'
+_RELATIONSHIP = '{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'
+
+# Части документа, которые может читать потоковый экстрактор:
+# имя -> шаблон файла внутри архива (None — основной текст документа)
+DOCX_PARTS = {
+    'document': None,
+    'headers': re.compile(r'word/header(\d*)\.xml$'),
+    'footers': re.compile(r'word/footer(\d*)\.xml$'),
+    'footnotes': re.compile(r'word/footnotes()\.xml$'),
+    'endnotes': re.compile(r'word/endnotes()\.xml$'),
+    'comments': re.compile(r'word/comments()\.xml$'),
+}
+DEFAULT_PARTS = ('document',)
+
+# Элементы внутри абзаца, которые заменяются символами
+_SPECIAL_CHARS = {
+    _W + 'tab': '\t',
+    _W + 'br': '\n',
+    _W + 'cr': '\n',
+    _W + 'noBreakHyphen': '-',
+}
+
+
+def Document(file_path):
+    # python-docx импортируется при первом открытии документа
+    return docx.Document(file_path)
+
+
+def _open_zip(source):
+    # Источник — путь, байты или открытый двоичный файл
+    return zipfile.ZipFile(as_file(source))
+
+
+def _main_part(archive):
+    # Путь к основному тексту берётся из _rels/.rels, обычно это word/document.xml
+    try:
+        with archive.open('_rels/.rels') as rels:
+            for relationship in ElementTree.parse(rels).getroot().iter(_RELATIONSHIP):
+                if relationship.get('Type') == _OFFICE_DOCUMENT:
+                    return posixpath.normpath(relationship.get('Target').lstrip('/'))
+    except KeyError:
+        pass
+    return 'word/document.xml'
+
+
+def _part_names(archive, parts):
+    names = archive.namelist()
+    for part in parts:
+        try:
+            pattern = DOCX_PARTS[part]
+        except KeyError:
+            raise ValueError(f"Неизвестная часть DOCX: '{part}'") from None
+        if pattern is None:
+            yield _main_part(archive)
+            continue
+        matched = [(match.group(1), name) for name in names for match in [pattern.match(name)] if match]
+        for _, name in sorted(matched, key=lambda item: int(item[0] or 0)):
+            yield name
+
+
+def _iter_part_paragraphs(stream):
+    # Абзацы выдаются по событию закрытия <w:p>. Каждый закрытый элемент вне абзаца
+    # (абзац, таблица, строка) удаляется из родителя, поэтому в памяти остаются только
+    # открытые элементы и текущий абзац. Абзацы таблиц и надписей выдаются в порядке следования
+    parents = []
+    stack = []
+    # Глубина вложенности внутри mc:Fallback: его содержимое пропускается
+    fallback_depth = 0
+    for event, element in ElementTree.iterparse(stream, events=('start', 'end')):
+        tag = element.tag
+        if event == 'start':
+            parents.append(element)
+            if fallback_depth or tag == _MC_FALLBACK:
+                fallback_depth += 1
+            elif tag == _W + 'p':
+                stack.append([])
+            continue
+        parents.pop()
+        if fallback_depth:
+            fallback_depth -= 1
+            if fallback_depth:
+                continue
+            # Закрылся сам mc:Fallback, его копия надписи больше не нужна
+            element.clear()
+        elif tag == _W + 't' and stack:
+            stack[-1].append(element.text or '')
+        elif tag in _SPECIAL_CHARS and stack:
+            stack[-1].append(_SPECIAL_CHARS[tag])
+        elif tag == _W + 'p':
+            yield ''.join(stack.pop())
+        if not stack:
+            # Содержимое вложенных абзацев освобождается вместе с внешним абзацем
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+
+
+def iter_docx_paragraphs(source, parts=DEFAULT_PARTS):
+    # Потоковое чтение текста абзацев прямо из XML внутри архива,
+    # без построения объектной модели python-docx
+    with _open_zip(source) as archive:
+        for name in list(_part_names(archive, parts)):
+            with archive.open(name) as stream:
+                yield from _iter_part_paragraphs(stream)
+
+
+def _variant(fast=False, parts=DEFAULT_PARTS):
+    return f"xml:{','.join(parts)}" if fast else 'python-docx'
+
+
+@cached_extraction('docx', version=1, variant=_variant)
+def extract_text_from_docx(file_path, fast=False, parts=DEFAULT_PARTS):
+    # fast=True читает XML потоком: быстрее, включает текст таблиц,
+    # а через parts — колонтитулы, сноски и примечания
     try:
-        doc = Document(file_path)
+        if fast:
+            with metrics.timer('docx.stream'):
+                return '\n'.join(iter_docx_paragraphs(file_path, parts))
+        with metrics.timer('docx.open'):
+            doc = Document(as_file(file_path))
         full_text = []
         for para in doc.paragraphs:
             full_text.append(para.text)
@@ -0,0 +1,115 @@
+import functools
+import hashlib
+import inspect
+
+from parser.utils import metrics
+from parser.utils.cache_store import SqliteCacheStore
+from parser.utils.sources import as_buffer, is_buffer, is_path, open_buffer
+
+_cache = None
+
+
+def set_extraction_cache(cache):
+    # Включает кэш извлечённого текста для всех экстракторов (None — выключает)
+    global _cache
+    _cache = cache
+
+
+def get_extraction_cache():
+    return _cache
+
+
+def open_extraction_cache(path, max_bytes=None):
+    cache = SqliteCacheStore(path, max_bytes=max_bytes)
+    set_extraction_cache(cache)
+    return cache
+
+
+def file_digest(file_path):
+    # Файл отображается в память, хэш считается без чтения файла в кучу Python
+    with open_buffer(file_path) as buffer:
+        return hashlib.sha256(buffer).hexdigest()
+
+
+def source_digest(source):
+    # None — для файловых объектов: их нельзя прочитать для хэша, не потеряв данные
+    if is_path(source):
+        return file_digest(source)
+    if is_buffer(source):
+        return hashlib.sha256(as_buffer(source)).hexdigest()
+    return None
+
+
+def _cache_key(name, version, variant, source, args, kwargs):
+    # None — результат не кэшируется
+    try:
+        digest = source_digest(source)
+    except OSError:
+        # Ошибку чтения файла обработает сам экстрактор
+        return None
+    if digest is None:
+        return None
+    key = f"{name}:{version}:{digest}"
+    if variant is not None:
+        key = f"{key}:{variant(*args, **kwargs)}"
+    return key
+
+
+def _lookup(cache, key):
+    cached = cache.get(key)
+    if cached is not None:
+        metrics.increment('extraction_cache.hits')
+        return cached.decode('utf-8')
+    metrics.increment('extraction_cache.misses')
+    return None
+
+
+def cached_extraction(name, version, variant=None):
+    # Ключ кэша — хэш содержимого файла, имя экстрактора и его версия:
+    # при изменении логики экстрактора достаточно увеличить version.
+    # variant(*args, **kwargs) возвращает добавку к ключу для параметров,
+    # от которых зависит извлечённый текст. Декорировать можно и корутину:
+    # хэш и обращения к кэшу тогда выполняются в потоке, не блокируя цикл событий
+    def decorator(extract):
+        if inspect.iscoroutinefunction(extract):
+            @functools.wraps(extract)
+            async def async_wrapper(file_path, *args, **kwargs):
+                import asyncio
+
+                cache = _cache
+                if cache is None:
+                    return await extract(file_path, *args, **kwargs)
+                key = await asyncio.to_thread(_cache_key, name, version, variant, file_path, args, kwargs)
+                if key is None:
+                    return await extract(file_path, *args, **kwargs)
+                cached = await asyncio.to_thread(_lookup, cache, key)
+                if cached is not None:
+                    return cached
+
+                text = await extract(file_path, *args, **kwargs)
+                if text:
+                    await asyncio.to_thread(cache.put, key, text.encode('utf-8'))
+                return text
+            async_wrapper.cache_namespace = (name, version)
+            return async_wrapper
+
+        @functools.wraps(extract)
+        def wrapper(file_path, *args, **kwargs):
+            cache = _cache
+            if cache is None:
+                return extract(file_path, *args, **kwargs)
+            key = _cache_key(name, version, variant, file_path, args, kwargs)
+            if key is None:
+                return extract(file_path, *args, **kwargs)
+            cached = _lookup(cache, key)
+            if cached is not None:
+                return cached
+
+            text = extract(file_path, *args, **kwargs)
+            if text:
+                cache.put(key, text.encode('utf-8'))
+            return text
+        # Имя и версия кэша, чтобы асинхронный вариант экстрактора делил с ним записи
+        wrapper.cache_namespace = (name, version)
+        return wrapper
+    return decorator
@@ -0,0 +1,243 @@
+import codecs
+import re
+from html.parser import HTMLParser
+
+# Зарегистрированные парсеры HTML: имя -> функция, возвращающая список текстов абзацев <p>
+_backends = {}
+
+_CHARSET_RE = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+_HEADER_CHARSET_RE = re.compile(r'charset\s*=\s*["\']?([a-zA-Z0-9_.:-]+)', re.IGNORECASE)
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+# Сколько байт начала документа просматривается в поисках <meta charset>
+META_SNIFF_BYTES = 4096
+
+# lxml не принимает строку с XML-объявлением (страницы XHTML), поэтому оно удаляется:
+# текст к этому моменту уже декодирован
+_XML_DECLARATION_RE = re.compile(r'^\ufeff?\s*<\?xml[^>]*\?>')
+
+
+def register_backend(name, paragraphs):
+    _backends[name] = paragraphs
+
+
+def get_backend(name):
+    try:
+        return _backends[name]
+    except KeyError:
+        raise ValueError(f"Неизвестный парсер HTML: '{name}'") from None
+
+
+def available_backends():
+    return sorted(_backends)
+
+
+def _known_encoding(name):
+    try:
+        return codecs.lookup(name).name
+    except (LookupError, TypeError):
+        return None
+
+
+def detect_encoding(content, content_type=None, fallback=None):
+    # Быстрый путь: заголовок Content-Type, BOM, <meta charset> в начале документа.
+    # Только если ничего не найдено, вызывается fallback (медленное определение по содержимому)
+    if isinstance(content_type, str):
+        match = _HEADER_CHARSET_RE.search(content_type)
+        if match:
+            encoding = _known_encoding(match.group(1))
+            if encoding:
+                return encoding
+
+    for bom, encoding in _BOMS:
+        if content.startswith(bom):
+            return encoding
+
+    match = _CHARSET_RE.search(content[:META_SNIFF_BYTES])
+    if match:
+        encoding = _known_encoding(match.group(1).decode('ascii'))
+        if encoding:
+            return encoding
+
+    if fallback is not None:
+        encoding = _known_encoding(fallback())
+        if encoding:
+            return encoding
+    return 'utf-8'
+
+
+def guess_encoding(content):
+    # Определение кодировки по содержимому через charset_normalizer (зависимость requests).
+    # ASCII не отличить от UTF-8, поэтому для него возвращается None
+    try:
+        import charset_normalizer
+    except ImportError:
+        return None
+    best = charset_normalizer.from_bytes(content).best()
+    if best is None or _known_encoding(best.encoding) == 'ascii':
+        return None
+    return best.encoding
+
+
+def _lxml_paragraphs(html_content):
+    import lxml.html
+
+    if isinstance(html_content, str):
+        html_content = _XML_DECLARATION_RE.sub('', html_content, count=1)
+    if not html_content.strip():
+        return []
+    tree = lxml.html.fromstring(html_content)
+    return [paragraph.text_content().strip() for paragraph in tree.iter('p')]
+
+
+def _selectolax_paragraphs(html_content):
+    from selectolax.parser import HTMLParser as SelectolaxParser
+
+    tree = SelectolaxParser(html_content)
+    return [node.text(strip=False).strip() for node in tree.css('p')]
+
+
+register_backend('lxml', _lxml_paragraphs)
+register_backend('selectolax', _selectolax_paragraphs)
+
+
+class _ParagraphCollector(HTMLParser):
+    # Потоковый сбор текста абзацев на стандартном html.parser
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._depth = 0
+        self._parts = []
+        self.ready = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'p':
+            # Незакрытый <p> закрывается следующим <p>, как в браузере
+            if self._depth:
+                self._flush()
+            self._depth = 1
+
+    def handle_endtag(self, tag):
+        if tag == 'p' and self._depth:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._depth:
+            self._parts.append(data)
+
+    def _flush(self):
+        self.ready.append(''.join(self._parts).strip())
+        self._parts = []
+        self._depth = 0
+
+    def close(self):
+        super().close()
+        if self._depth:
+            self._flush()
+
+
+def _iter_paragraphs_stdlib(chunks, encoding):
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    collector = _ParagraphCollector()
+    for chunk in chunks:
+        collector.feed(decoder.decode(chunk))
+        yield from collector.ready
+        collector.ready.clear()
+    collector.feed(decoder.decode(b'', final=True))
+    collector.close()
+    yield from collector.ready
+
+
+def _iter_paragraphs_lxml(chunks, encoding):
+    from lxml import etree
+
+    # Закрытый элемент вне абзаца очищается, а его предыдущие соседи удаляются из дерева,
+    # поэтому в памяти остаются только открытые элементы, а не вся страница
+    parser = etree.HTMLPullParser(events=('start', 'end'), encoding=encoding)
+    depth = 0
+
+    def paragraphs():
+        nonlocal depth
+        for event, element in parser.read_events():
+            if element.tag == 'p':
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                text = ''.join(element.itertext()).strip()
+                _release(element)
+                yield text
+            elif event == 'end' and not depth:
+                _release(element)
+
+    fed = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parser.feed(chunk)
+        fed = True
+        yield from paragraphs()
+    if not fed:
+        return
+    parser.close()
+    yield from paragraphs()
+
+
+def _release(element):
+    element.clear()
+    while element.getprevious() is not None:
+        del element.getparent()[0]
+
+
+# Парсеры с потоковым разбором: имя -> функция (фрагменты байтов, кодировка) -> абзацы
+_streaming_backends = {
+    'html.parser': _iter_paragraphs_stdlib,
+    'lxml': _iter_paragraphs_lxml,
+}
+
+
+def register_streaming_backend(name, paragraphs):
+    _streaming_backends[name] = paragraphs
+
+
+def get_streaming_backend(name):
+    try:
+        return _streaming_backends[name]
+    except KeyError:
+        raise ValueError(f"Потоковый разбор не поддерживается парсером HTML: '{name}'") from None
+
+
+def _sniff_prefix(chunks):
+    # Фрагменты накапливаются, пока не наберётся META_SNIFF_BYTES или не кончится поток:
+    # при поблочной передаче первый фрагмент часто обрывается до <meta charset>
+    buffered = []
+    size = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        buffered.append(chunk)
+        size += len(chunk)
+        if size >= META_SNIFF_BYTES:
+            break
+    return b''.join(buffered)
+
+
+def iter_paragraphs(chunks, encoding=None, content_type=None, backend='html.parser', fallback=guess_encoding):
+    # Инкрементальное извлечение абзацев, пока байты страницы ещё поступают.
+    # Кодировка определяется по заголовку или по первым META_SNIFF_BYTES документа;
+    # если они ничего не дают — функцией fallback по тем же байтам
+    paragraphs = get_streaming_backend(backend)
+    chunks = iter(chunks)
+    prefix = _sniff_prefix(chunks)
+    if encoding is None:
+        guess = (lambda: fallback(prefix)) if fallback is not None else None
+        encoding = detect_encoding(prefix, content_type, fallback=guess)
+
+    def all_chunks():
+        yield prefix
+        yield from chunks
+
+    yield from paragraphs(all_chunks(), encoding)
@@ -0,0 +1,127 @@
+import asyncio
+from collections import namedtuple
+from urllib.parse import urlsplit
+
+from parser.utils import metrics
+from parser.utils.html_backends import detect_encoding, guess_encoding
+from parser.utils.html_extractor import extract_paragraphs
+from parser.utils.lazy_import import lazy_import
+
+httpx = lazy_import('httpx')
+
+# Результат загрузки страницы: статус ответа, текст абзацев (None при ошибке),
+# признак того, что текст взят из кэша по ответу 304, и описание ошибки
+CrawlResult = namedtuple('CrawlResult', ['url', 'status', 'text', 'not_modified', 'error'])
+
+# Статусы, при которых запрос стоит повторить
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class HtmlCrawler:
+    # Асинхронная загрузка страниц через общий пул соединений httpx
+    # с ограничением числа одновременных запросов к одному хосту,
+    # повторами с экспоненциальной задержкой и условными GET-запросами
+    def __init__(self, per_host_limit=4, max_connections=32, timeout=10.0,
+                 retries=3, backoff=0.5, client=None, backend='html.parser'):
+        self.per_host_limit = per_host_limit
+        self.backend = backend
+        self.retries = retries
+        self.backoff = backoff
+        self._own_client = client is None
+        self._client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections),
+            timeout=timeout,
+            follow_redirects=True,
+        )
+        self._host_limits = {}
+        # url -> (ETag, Last-Modified, текст) для условных запросов
+        self._validators = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._own_client:
+            await self._client.aclose()
+
+    def _host_limit(self, url):
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host_limit)
+        return self._host_limits[host]
+
+    def _conditional_headers(self, url):
+        headers = {}
+        etag, last_modified, _ = self._validators.get(url, (None, None, None))
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+        return headers
+
+    async def _get(self, url):
+        attempt = 0
+        while True:
+            try:
+                async with self._host_limit(url):
+                    with metrics.timer('http.fetch'):
+                        response = await self._client.get(url, headers=self._conditional_headers(url))
+                if response.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                    return response
+            except httpx.TransportError:
+                if attempt >= self.retries:
+                    raise
+            metrics.increment('http.retries')
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    async def fetch(self, url):
+        try:
+            response = await self._get(url)
+        except Exception as e:
+            return CrawlResult(url, None, None, False, str(e))
+
+        if response.status_code == 304 and url in self._validators:
+            return CrawlResult(url, 304, self._validators[url][2], True, None)
+        if response.status_code != 200:
+            return CrawlResult(url, response.status_code, None, False,
+                               f"Ошибка при загрузке страницы: {response.status_code}")
+
+        try:
+            encoding = detect_encoding(response.content, response.headers.get('Content-Type'),
+                                       fallback=lambda: guess_encoding(response.content))
+            text = extract_paragraphs(response.content.decode(encoding, errors='replace'), self.backend)
+        except Exception as e:
+            return CrawlResult(url, response.status_code, None, False, f"Ошибка при парсинге HTML: {e}")
+
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._validators[url] = (etag, last_modified, text)
+        return CrawlResult(url, response.status_code, text, False, None)
+
+    async def crawl(self, urls):
+        # Результаты выдаются по мере загрузки страниц, а не в порядке urls
+        tasks = [asyncio.ensure_future(self.fetch(url)) for url in urls]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+async def crawl(urls, **kwargs):
+    async with HtmlCrawler(**kwargs) as crawler:
+        async for result in crawler.crawl(urls):
+            yield result
+
+
+def crawl_urls(urls, **kwargs):
+    # Синхронная обёртка: список результатов для всех url
+    async def collect():
+        return [result async for result in crawl(urls, **kwargs)]
+    return asyncio.run(collect())
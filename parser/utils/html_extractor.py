@@ -1,16 +1,49 @@
-from bs4 import BeautifulSoup
-import requests
+from parser.utils import metrics
+from parser.utils.html_backends import detect_encoding, get_backend, iter_paragraphs, register_backend
+from parser.utils.lazy_import import lazy_import
 
-def parse_html(url):
+bs4 = lazy_import('bs4')
+requests = lazy_import('requests')
+
+
+def BeautifulSoup(markup, features):
+    # bs4 импортируется при первом разборе страницы
+    return bs4.BeautifulSoup(markup, features)
+
+
+def _soup_paragraphs(html_content):
+    soup = BeautifulSoup(html_content, 'html.parser')
+    paragraphs = soup.find_all('p')
+    return [paragraph.text.strip() for paragraph in paragraphs]
+
+
+register_backend('html.parser', _soup_paragraphs)
+
+
+def extract_paragraphs(html_content, backend='html.parser'):
+    # Текст всех абзацев <p> страницы через пробел
+    with metrics.timer('html.parse'):
+        return ' '.join(get_backend(backend)(html_content))
+
+
+def response_encoding(response):
+    # Кодировка из заголовков или <meta charset>; apparent_encoding
+    # (определение по всему содержимому) — только если их нет
+    return detect_encoding(
+        response.content,
+        response.headers.get('Content-Type'),
+        fallback=lambda: response.apparent_encoding,
+    )
+
+
+def parse_html(url, backend='html.parser'):
     try:
-        response = requests.get(url)
+        with metrics.timer('http.fetch'):
+            response = requests.get(url)
         if response.status_code == 200:
-            # Попробуем определить кодировку
-            encoding = response.apparent_encoding
-            html_content = response.content.decode(encoding)
-            soup = BeautifulSoup(html_content, 'html.parser')
-            paragraphs = soup.find_all('p')
-            full_text = ' '.join(paragraph.text.strip() for paragraph in paragraphs)
+            encoding = response_encoding(response)
+            html_content = response.content.decode(encoding, errors='replace')
+            full_text = extract_paragraphs(html_content, backend)
             print("Извлеченный текст из HTML:")
             print(full_text)
             analyze_text(full_text)
@@ -18,3 +51,14 @@ def parse_html(url):
             print(f"Ошибка при загрузке страницы: {response.status_code}")
     except Exception as e:
         print(f"Ошибка при парсинге HTML: {e}")
+
+
+def iter_html_paragraphs(url, backend='html.parser', chunk_size=64 * 1024, timeout=10):
+    # Абзацы выдаются по мере загрузки страницы, без чтения всего ответа в память
+    with requests.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        yield from iter_paragraphs(
+            response.iter_content(chunk_size=chunk_size),
+            content_type=response.headers.get('Content-Type'),
+            backend=backend,
+        )
@@ -1,3 +1,4 @@
 from parser.utils.html_extractor import parse_html
+from parser.utils.html_crawler import crawl, crawl_urls
 
-__all__ = ['parse_html'] 
\ No newline at end of file
+__all__ = ['parse_html', 'crawl', 'crawl_urls'] 
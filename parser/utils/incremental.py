@@ -0,0 +1,140 @@
+import hashlib
+import re
+from collections import namedtuple
+
+from parser.Exceptions import LanguageError
+from parser.utils import metrics
+from parser.utils.text_analyzer import (
+    MIN_PARAGRAPH_CHARS,
+    _PARAGRAPH_RE,
+    _disabled_components,
+    _load_model,
+    detect_language,
+    iter_paragraph_spans,
+    langdetect,
+)
+
+# Проанализированный абзац: хэш текста, границы в документе, язык и токены.
+# 'idx' токенов отсчитывается от начала абзаца, поэтому абзац можно
+# перенести в новую редакцию документа без повторного анализа
+Paragraph = namedtuple('Paragraph', ['digest', 'start', 'end', 'language', 'tokens'])
+
+
+def paragraph_digest(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class IncrementalAnalysis:
+    # Результат анализа редакции документа. Передаётся как previous при анализе
+    # следующей редакции; reused и analyzed — число абзацев, взятых из предыдущей
+    # редакции и проанализированных заново
+    def __init__(self, paragraphs, profile, separator, reused=0, analyzed=0):
+        self.paragraphs = paragraphs
+        self.profile = profile
+        self.separator = separator
+        self.reused = reused
+        self.analyzed = analyzed
+
+    def tokens(self):
+        # Токены всего документа; 'idx' — смещение от начала текста этой редакции
+        result = []
+        for paragraph in self.paragraphs:
+            for token in paragraph.tokens:
+                result.append(dict(token, idx=paragraph.start + token['idx']))
+        return result
+
+    def to_dict(self):
+        return {
+            'profile': self.profile,
+            'separator': self.separator.pattern,
+            'paragraphs': [paragraph._asdict() for paragraph in self.paragraphs],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        paragraphs = [Paragraph(**paragraph) for paragraph in data['paragraphs']]
+        return cls(paragraphs, data['profile'], re.compile(data['separator']))
+
+
+def _paragraph_tokens(doc):
+    # Пробельные токены пропускаются: текст абзаца не нормализуется,
+    # чтобы смещения совпадали с исходным документом
+    return [
+        {
+            'text': token.text,
+            'lemma': token.lemma_,
+            'position': token.pos_,
+            'dependency': token.dep_,
+            'idx': token.idx,
+        }
+        for token in doc if not token.is_space
+    ]
+
+
+def _detect(text):
+    try:
+        return detect_language(' '.join(text.split()))
+    except langdetect.LangDetectException as e:
+        raise LanguageError(message=f"Не удалось определить язык текста: {str(e)}")
+
+
+def analyze_text_incremental(text, previous=None, profile='full', language=None, batch_size=64,
+                             separator=None):
+    # Анализирует только новые и изменённые абзацы, остальные берутся из previous
+    # по хэшу текста (в том числе если абзац переместился). Стоимость повторной
+    # обработки пропорциональна объёму правки, а не размеру документа.
+    # separator — регулярное выражение границы абзацев (по умолчанию — пустая строка);
+    # для текста DOCX, где абзацы разделены одним переводом строки, подходит r'\n'
+    if separator is None:
+        separator = previous.separator if previous is not None else _PARAGRAPH_RE
+    elif isinstance(separator, str):
+        separator = re.compile(separator)
+    disable = _disabled_components(profile)
+
+    known = {}
+    if previous is not None and previous.profile == profile and previous.separator.pattern == separator.pattern:
+        for paragraph in previous.paragraphs:
+            if language is None or paragraph.language == language:
+                known.setdefault(paragraph.digest, paragraph)
+
+    paragraphs = []
+    pending = {}
+    last_language = None
+    for start, end in iter_paragraph_spans(text, separator):
+        chunk = text[start:end]
+        digest = paragraph_digest(chunk)
+        old = known.get(digest)
+        if old is not None:
+            paragraph = Paragraph(digest, start, end, old.language, old.tokens)
+        else:
+            if language is not None:
+                paragraph_language = language
+            elif last_language is not None and len(chunk.strip()) < MIN_PARAGRAPH_CHARS:
+                # По коротким абзацам язык ненадёжен, они наследуют язык предыдущего
+                paragraph_language = last_language
+            else:
+                paragraph_language = _detect(chunk)
+            paragraph = Paragraph(digest, start, end, paragraph_language, None)
+            pending.setdefault(paragraph_language, []).append(len(paragraphs))
+        last_language = paragraph.language
+        paragraphs.append(paragraph)
+
+    if not paragraphs:
+        raise LanguageError(message="Текст для анализа не может быть пустым.")
+
+    analyzed = 0
+    for paragraph_language, indexes in pending.items():
+        nlp = _load_model(paragraph_language)
+        try:
+            texts = (text[paragraphs[index].start:paragraphs[index].end] for index in indexes)
+            with metrics.timer('spacy.pipe'):
+                docs = list(nlp.pipe(texts, batch_size=batch_size, disable=disable))
+        except Exception as e:
+            raise LanguageError(message=f"Ошибка при анализе текста: {str(e)}")
+        for index, doc in zip(indexes, docs):
+            paragraphs[index] = paragraphs[index]._replace(tokens=_paragraph_tokens(doc))
+        analyzed += len(indexes)
+
+    metrics.increment('incremental.reused', len(paragraphs) - analyzed)
+    metrics.increment('incremental.analyzed', analyzed)
+    return IncrementalAnalysis(paragraphs, profile, separator, len(paragraphs) - analyzed, analyzed)
@@ -0,0 +1,369 @@
+import bisect
+import json
+import mmap
+import os
+import struct
+import tempfile
+from collections import namedtuple
+
+# Позиционный обратный индекс по леммам. Индекс хранится в каталоге сегментами:
+# каждый commit() записывает новый неизменяемый сегмент, слияние объединяет
+# сегменты в один. Список действующих сегментов — в файле segments.json.
+#
+# Формат сегмента: заголовок <4sQ (сигнатура, длина метаданных), метаданные JSON
+# (ключи документов и словарь лемм) и блок списков вхождений. Список вхождений
+# леммы — последовательность чисел varint: для каждого документа разность номера
+# с предыдущим документом, число вхождений и пары (разность позиции, часть речи)
+MAGIC = b'PIX1'
+_HEADER = struct.Struct('<4sQ')
+MANIFEST = 'segments.json'
+
+# Части речи хранятся номерами из общей для всех сегментов таблицы универсальных
+# тегов, поэтому при слиянии списки вхождений копируются без перекодирования
+POS_TAGS = ('X', 'ADJ', 'ADP', 'ADV', 'AUX', 'CCONJ', 'DET', 'INTJ', 'NOUN', 'NUM',
+            'PART', 'PRON', 'PROPN', 'PUNCT', 'SCONJ', 'SYM', 'VERB', 'SPACE')
+_TAG_IDS = {tag: index for index, tag in enumerate(POS_TAGS)}
+
+# Токены с этими частями речи не индексируются и не занимают позиций,
+# чтобы фраза находилась и через знаки препинания
+SKIP_POS = frozenset({'PUNCT', 'SPACE', 'SYM'})
+
+# Словарь сегмента: смещение и длина списка вхождений, число документов и номер последнего
+Term = namedtuple('Term', ['offset', 'length', 'doc_freq', 'last_doc'])
+
+
+def encode_varint(value, out):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varints(data):
+    values = []
+    value = 0
+    shift = 0
+    for byte in data:
+        value |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            values.append(value)
+            value = 0
+            shift = 0
+    return values
+
+
+def _varint_size(data):
+    size = 0
+    while data[size] & 0x80:
+        size += 1
+    return size + 1
+
+
+def _pos_filter(pos):
+    # None — любая часть речи; строка или набор строк — допустимые теги
+    if pos is None:
+        return None
+    tags = {pos} if isinstance(pos, str) else set(pos)
+    unknown = tags - set(POS_TAGS)
+    if unknown:
+        raise ValueError(f"Неизвестная часть речи: {', '.join(sorted(unknown))}")
+    return {_TAG_IDS[tag] for tag in tags}
+
+
+class _Segment:
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            magic, meta_size = _HEADER.unpack(self._file.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"Файл не является сегментом индекса: {path}")
+            meta = json.loads(self._file.read(meta_size).decode('utf-8'))
+            self._data_start = _HEADER.size + meta_size
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        self.docs = meta['docs']
+        self.terms = {lemma: Term(*entry) for lemma, entry in meta['terms'].items()}
+
+    def raw_postings(self, lemma):
+        term = self.terms.get(lemma)
+        if term is None:
+            return None
+        start = self._data_start + term.offset
+        return self._map[start:start + term.length]
+
+    def postings(self, lemma, tags=None):
+        # {номер документа в сегменте: [позиции]} с учётом фильтра частей речи
+        raw = self.raw_postings(lemma)
+        if raw is None:
+            return {}
+        values = decode_varints(raw)
+        result = {}
+        doc = 0
+        index = 0
+        while index < len(values):
+            doc += values[index]
+            count = values[index + 1]
+            index += 2
+            positions = []
+            position = 0
+            for _ in range(count):
+                position += values[index]
+                if tags is None or values[index + 1] in tags:
+                    positions.append(position)
+                index += 2
+            if positions:
+                result[doc] = positions
+        return result
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+
+def _write_segment(path, docs, terms_data):
+    # terms_data: лемма -> (байты списка вхождений, число документов, последний документ)
+    terms = {}
+    offset = 0
+    for lemma in sorted(terms_data):
+        data, doc_freq, last_doc = terms_data[lemma]
+        terms[lemma] = [offset, len(data), doc_freq, last_doc]
+        offset += len(data)
+    meta = json.dumps({'docs': docs, 'terms': terms}, ensure_ascii=False).encode('utf-8')
+
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile('wb', dir=directory, delete=False) as file:
+        file.write(_HEADER.pack(MAGIC, len(meta)))
+        file.write(meta)
+        for lemma in sorted(terms_data):
+            file.write(terms_data[lemma][0])
+    os.replace(file.name, path)
+
+
+def _merge_segments(segments, path):
+    # Номера документов каждого сегмента сдвигаются на число документов предыдущих.
+    # Для каждой леммы перекодируется только первая разность номеров документов,
+    # остальная часть списка вхождений копируется как есть
+    docs = []
+    bases = []
+    for segment in segments:
+        bases.append(len(docs))
+        docs.extend(segment.docs)
+
+    terms_data = {}
+    for lemma in sorted(set().union(*(segment.terms for segment in segments))):
+        out = bytearray()
+        previous = 0
+        doc_freq = 0
+        for base, segment in zip(bases, segments):
+            raw = segment.raw_postings(lemma)
+            if raw is None:
+                continue
+            term = segment.terms[lemma]
+            first_size = _varint_size(raw)
+            first_doc = decode_varints(raw[:first_size])[0]
+            encode_varint(base + first_doc - previous, out)
+            out += raw[first_size:]
+            previous = base + term.last_doc
+            doc_freq += term.doc_freq
+        terms_data[lemma] = (bytes(out), doc_freq, previous)
+    _write_segment(path, docs, terms_data)
+
+
+class InvertedIndex:
+    # Индекс в каталоге directory. add_document() накапливает документы в памяти,
+    # commit() записывает их новым сегментом; когда сегментов становится
+    # merge_factor, они сливаются в один
+    def __init__(self, directory, merge_factor=10, max_buffered_docs=10000):
+        if merge_factor < 2 or max_buffered_docs < 1:
+            raise ValueError("merge_factor должен быть не меньше 2, max_buffered_docs — больше 0")
+        self.directory = directory
+        self.merge_factor = merge_factor
+        self.max_buffered_docs = max_buffered_docs
+        os.makedirs(directory, exist_ok=True)
+        self._segments = []
+        self._bases = []
+        self._next_segment = 1
+        self._reset_buffer()
+        self._open_segments()
+
+    def _reset_buffer(self):
+        self._docs = []
+        self._pending = {}
+
+    def _read_manifest(self):
+        path = os.path.join(self.directory, MANIFEST)
+        if not os.path.exists(path):
+            return {'segments': [], 'next': 1}
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+
+    def _write_manifest(self, names):
+        path = os.path.join(self.directory, MANIFEST)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=self.directory, delete=False) as file:
+            json.dump({'segments': names, 'next': self._next_segment}, file)
+        os.replace(file.name, path)
+
+    def _open_segments(self):
+        manifest = self._read_manifest()
+        self._next_segment = manifest['next']
+        self._segments = [_Segment(os.path.join(self.directory, name)) for name in manifest['segments']]
+        self._bases = []
+        total = 0
+        for segment in self._segments:
+            self._bases.append(total)
+            total += len(segment.docs)
+
+    def _close_segments(self):
+        for segment in self._segments:
+            segment.close()
+        self._segments = []
+        self._bases = []
+
+    def _new_segment_name(self):
+        name = f'segment_{self._next_segment:06d}.pix'
+        self._next_segment += 1
+        return name
+
+    def add_document(self, key, tokens):
+        # tokens — результат analyze_text (список словарей или TokenTable)
+        doc = len(self._docs)
+        self._docs.append(key)
+        position = 0
+        for token in tokens:
+            tag = token['position']
+            lemma = token['lemma'].lower()
+            if tag in SKIP_POS or not lemma.strip():
+                continue
+            entries = self._pending.setdefault(lemma, [])
+            if not entries or entries[-1][0] != doc:
+                entries.append((doc, []))
+            entries[-1][1].append((position, _TAG_IDS.get(tag, 0)))
+            position += 1
+        if len(self._docs) >= self.max_buffered_docs:
+            self.commit()
+
+    def commit(self):
+        if not self._docs:
+            return
+        terms_data = {}
+        for lemma, entries in self._pending.items():
+            out = bytearray()
+            previous_doc = 0
+            for doc, occurrences in entries:
+                encode_varint(doc - previous_doc, out)
+                encode_varint(len(occurrences), out)
+                previous_position = 0
+                for position, tag_id in occurrences:
+                    encode_varint(position - previous_position, out)
+                    encode_varint(tag_id, out)
+                    previous_position = position
+                previous_doc = doc
+            terms_data[lemma] = (bytes(out), len(entries), previous_doc)
+
+        names = [os.path.basename(segment.path) for segment in self._segments]
+        name = self._new_segment_name()
+        _write_segment(os.path.join(self.directory, name), self._docs, terms_data)
+        self._write_manifest(names + [name])
+        self._reset_buffer()
+
+        self._close_segments()
+        self._open_segments()
+        if len(self._segments) >= self.merge_factor:
+            self.merge()
+
+    def merge(self):
+        # Сливает все сегменты в один; старые файлы удаляются после записи
+        # нового списка сегментов, поэтому прерванное слияние не теряет данные
+        if len(self._segments) < 2:
+            return
+        old_paths = [segment.path for segment in self._segments]
+        name = self._new_segment_name()
+        _merge_segments(self._segments, os.path.join(self.directory, name))
+        self._write_manifest([name])
+        self._close_segments()
+        for path in old_paths:
+            os.remove(path)
+        self._open_segments()
+
+    def segment_count(self):
+        return len(self._segments)
+
+    def __len__(self):
+        return sum(len(segment.docs) for segment in self._segments)
+
+    def _postings(self, lemma, tags):
+        # {глобальный номер документа: [позиции]} по всем сегментам
+        result = {}
+        for base, segment in zip(self._bases, self._segments):
+            for doc, positions in segment.postings(lemma.lower(), tags).items():
+                result[base + doc] = positions
+        return result
+
+    def _key(self, doc):
+        index = bisect.bisect_right(self._bases, doc) - 1
+        return self._segments[index].docs[doc - self._bases[index]]
+
+    def positions(self, lemma, pos=None):
+        # {ключ документа: [позиции леммы]}; позиции считаются без знаков препинания
+        return {self._key(doc): positions for doc, positions in self._postings(lemma, _pos_filter(pos)).items()}
+
+    def search(self, lemma, pos=None):
+        return [self._key(doc) for doc in sorted(self._postings(lemma, _pos_filter(pos)))]
+
+    def search_all(self, lemmas, pos=None):
+        # Документы, содержащие все леммы (в любом порядке)
+        tags = _pos_filter(pos)
+        docs = None
+        for lemma in sorted(lemmas, key=self._doc_freq):
+            found = self._postings(lemma, tags).keys()
+            docs = set(found) if docs is None else docs & found
+            if not docs:
+                return []
+        return [self._key(doc) for doc in sorted(docs or ())]
+
+    def phrase(self, lemmas, pos=None):
+        # Документы, где леммы идут подряд. pos — общий фильтр частей речи
+        # или список фильтров для каждой леммы (None — любая часть речи)
+        if not lemmas:
+            return []
+        filters = list(pos) if isinstance(pos, (list, tuple)) else [pos] * len(lemmas)
+        if len(filters) != len(lemmas):
+            raise ValueError("Число фильтров частей речи должно совпадать с числом лемм")
+
+        # Начинать пересечение выгоднее с самой редкой леммы
+        order = sorted(range(len(lemmas)), key=lambda index: self._doc_freq(lemmas[index]))
+        postings = {}
+        docs = None
+        for index in order:
+            postings[index] = self._postings(lemmas[index], _pos_filter(filters[index]))
+            docs = set(postings[index]) if docs is None else docs & postings[index].keys()
+            if not docs:
+                return []
+
+        found = []
+        for doc in sorted(docs):
+            position_sets = {index: set(postings[index][doc]) for index in range(1, len(lemmas))}
+            if any(all(start + index in position_sets[index] for index in position_sets)
+                   for start in postings[0][doc]):
+                found.append(self._key(doc))
+        return found
+
+    def _doc_freq(self, lemma):
+        lemma = lemma.lower()
+        return sum(segment.terms[lemma].doc_freq for segment in self._segments if lemma in segment.terms)
+
+    def close(self):
+        self.commit()
+        self._close_segments()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
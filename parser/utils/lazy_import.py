@@ -0,0 +1,46 @@
+import importlib
+import threading
+
+_lock = threading.Lock()
+
+
+class LazyModule:
+    # Заместитель модуля: сам модуль импортируется при первом обращении к его атрибуту.
+    # Тяжёлые зависимости (spaCy, PyMuPDF, python-docx, bs4, requests, httpx) не замедляют
+    # импорт пакета parser, если не используются. Запись и удаление атрибутов
+    # передаются настоящему модулю, поэтому unittest.mock.patch работает как обычно.
+    __slots__ = ('_name', '_module')
+
+    def __init__(self, name):
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_module', None)
+
+    def _load(self):
+        module = self._module
+        if module is None:
+            with _lock:
+                module = self._module
+                if module is None:
+                    module = importlib.import_module(self._name)
+                    object.__setattr__(self, '_module', module)
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __delattr__(self, attr):
+        delattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = 'загружен' if self._module is not None else 'не загружен'
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
@@ -0,0 +1,190 @@
+import os
+import tempfile
+import threading
+import time
+from contextlib import nullcontext
+
+# Когда сбор метрик выключен, timer() возвращает этот общий пустой контекст,
+# а increment() сразу выходит — накладные расходы сводятся к одной проверке
+_NULL_TIMER = nullcontext()
+
+_enabled = False
+_callbacks = []
+
+
+class MetricsRegistry:
+    # Хранилище метрик в памяти процесса: время этапов, распределения величин
+    # (например, размеров пакетов), счётчики событий и текущие значения (глубина очереди)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timers = {}
+        self.values = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def _summarize(self, table, name, value):
+        with self._lock:
+            stats = table.get(name)
+            if stats is None:
+                table[name] = {'count': 1, 'sum': value, 'max': value}
+            else:
+                stats['count'] += 1
+                stats['sum'] += value
+                stats['max'] = max(stats['max'], value)
+
+    def observe(self, stage, seconds):
+        self._summarize(self.timers, stage, seconds)
+
+    def observe_value(self, name, value):
+        self._summarize(self.values, name, value)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self.gauges[name] = value
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'timers': {stage: dict(stats) for stage, stats in self.timers.items()},
+                'values': {name: dict(stats) for name, stats in self.values.items()},
+                'counters': dict(self.counters),
+                'gauges': dict(self.gauges),
+            }
+
+    def reset(self):
+        with self._lock:
+            self.timers.clear()
+            self.values.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def to_prometheus(self):
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP parser_stage_seconds Время выполнения этапов обработки',
+            '# TYPE parser_stage_seconds summary',
+        ]
+        for stage, stats in sorted(snapshot['timers'].items()):
+            label = _label(stage)
+            lines.append(f'parser_stage_seconds_sum{{stage="{label}"}} {stats["sum"]:.6f}')
+            lines.append(f'parser_stage_seconds_count{{stage="{label}"}} {stats["count"]}')
+        lines.append('# HELP parser_stage_seconds_max Максимальное время выполнения этапа')
+        lines.append('# TYPE parser_stage_seconds_max gauge')
+        for stage, stats in sorted(snapshot['timers'].items()):
+            lines.append(f'parser_stage_seconds_max{{stage="{_label(stage)}"}} {stats["max"]:.6f}')
+        lines.append('# HELP parser_events_total Счётчики событий')
+        lines.append('# TYPE parser_events_total counter')
+        for name, value in sorted(snapshot['counters'].items()):
+            lines.append(f'parser_events_total{{name="{_label(name)}"}} {value}')
+        if snapshot['values']:
+            lines.append('# HELP parser_value Распределения величин (размеры пакетов и т. п.)')
+            lines.append('# TYPE parser_value summary')
+            for name, stats in sorted(snapshot['values'].items()):
+                label = _label(name)
+                lines.append(f'parser_value_sum{{name="{label}"}} {stats["sum"]}')
+                lines.append(f'parser_value_count{{name="{label}"}} {stats["count"]}')
+            lines.append('# HELP parser_value_max Максимальное значение величины')
+            lines.append('# TYPE parser_value_max gauge')
+            for name, stats in sorted(snapshot['values'].items()):
+                lines.append(f'parser_value_max{{name="{_label(name)}"}} {stats["max"]}')
+        if snapshot['gauges']:
+            lines.append('# HELP parser_gauge Текущие значения')
+            lines.append('# TYPE parser_gauge gauge')
+            for name, value in sorted(snapshot['gauges'].items()):
+                lines.append(f'parser_gauge{{name="{_label(name)}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # Запись через временный файл, чтобы node_exporter не прочитал файл наполовину
+        directory = os.path.dirname(os.path.abspath(path))
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=directory, delete=False) as file:
+            file.write(self.to_prometheus())
+        os.replace(file.name, path)
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = MetricsRegistry()
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def add_callback(callback):
+    # callback(kind, name, value): kind — 'timer' (value в секундах), 'value', 'counter' или 'gauge'
+    _callbacks.append(callback)
+
+
+def remove_callback(callback):
+    _callbacks.remove(callback)
+
+
+def _emit(kind, name, value):
+    if kind == 'timer':
+        registry.observe(name, value)
+    elif kind == 'value':
+        registry.observe_value(name, value)
+    elif kind == 'gauge':
+        registry.set_gauge(name, value)
+    else:
+        registry.increment(name, value)
+    for callback in list(_callbacks):
+        callback(kind, name, value)
+
+
+class _Timer:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        _emit('timer', self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def timer(stage):
+    if not _enabled:
+        return _NULL_TIMER
+    return _Timer(stage)
+
+
+def observe(stage, seconds):
+    if _enabled:
+        _emit('timer', stage, seconds)
+
+
+def increment(name, value=1):
+    if _enabled:
+        _emit('counter', name, value)
+
+
+def observe_value(name, value):
+    if _enabled:
+        _emit('value', name, value)
+
+
+def set_gauge(name, value):
+    if _enabled:
+        _emit('gauge', name, value)
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+from parser.utils import metrics
+from parser.utils.lazy_import import lazy_import
+
+spacy = lazy_import('spacy')
+
+# Соответствие языка и модели spaCy
+MODELS = {
+    'en': 'en_core_web_sm',
+    'ru': 'ru_core_news_sm',
+}
+
+
+class ModelRegistry:
+    # Хранит загруженные модели spaCy, чтобы каждая загружалась один раз на процесс.
+    # max_models ограничивает число моделей в памяти (вытесняется давно не использованная).
+    def __init__(self, max_models=None):
+        if max_models is not None and max_models < 1:
+            raise ValueError("max_models должен быть не меньше 1")
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def get(self, language):
+        model_name = MODELS[language]
+
+        with self._lock:
+            nlp = self._models.get(model_name)
+            if nlp is not None:
+                self._models.move_to_end(model_name)
+                return nlp
+            load_lock = self._load_locks.setdefault(model_name, threading.Lock())
+
+        # Загрузка идёт вне общего замка: разные языки могут грузиться параллельно,
+        # а одна и та же модель не будет загружена дважды
+        with load_lock:
+            with self._lock:
+                nlp = self._models.get(model_name)
+                if nlp is not None:
+                    self._models.move_to_end(model_name)
+                    return nlp
+
+            with metrics.timer('spacy.load'):
+                nlp = spacy.load(model_name)
+
+            with self._lock:
+                self._models[model_name] = nlp
+                self._evict()
+            return nlp
+
+    def preload(self, languages):
+        for language in languages:
+            self.get(language)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+            self._load_locks.clear()
+
+    def _evict(self):
+        if self.max_models is None:
+            return
+        while len(self._models) > self.max_models:
+            self._models.popitem(last=False)
+
+
+registry = ModelRegistry()
+
+
+def get_model(language):
+    return registry.get(language)
+
+
+def preload_models(languages=('en', 'ru')):
+    registry.preload(languages)
@@ -1,13 +1,91 @@
-import fitz  # PyMuPDF
+import os
+from collections import namedtuple
+from itertools import repeat
 
-def extract_text_from_pdf(file_path):
+from parser.utils import metrics
+from parser.utils.extraction_cache import cached_extraction
+from parser.utils.lazy_import import lazy_import
+from parser.utils.sources import as_buffer, is_path
+
+fitz = lazy_import('fitz')  # PyMuPDF
+
+# Страница PDF: номер (с нуля), текст и границы текста страницы
+# в байтах UTF-8 относительно начала всего извлечённого текста
+PdfPage = namedtuple('PdfPage', ['number', 'text', 'start', 'end'])
+
+
+def _open_document(source):
+    # Путь PyMuPDF открывает сам; байты, memoryview и файловые объекты
+    # открываются как поток поверх исходного буфера, без временного файла
+    if is_path(source):
+        return fitz.open(source)
+    return fitz.open(stream=as_buffer(source), filetype='pdf')
+
+
+def iter_pdf_pages(file_path):
+    # Постраничное извлечение: в памяти находится только текущая страница,
+    # документ закрывается сразу после обхода или при прерывании генератора
+    with metrics.timer('pdf.open'):
+        document = _open_document(file_path)
     try:
-        document = fitz.open(file_path)
-        text = ""
+        offset = 0
         for page_num in range(len(document)):
-            page = document.load_page(page_num)
-            text += page.get_text()
-        return text
+            with metrics.timer('pdf.page_text'):
+                page = document.load_page(page_num)
+                text = page.get_text()
+            metrics.increment('pdf.pages')
+            size = len(text.encode('utf-8'))
+            yield PdfPage(page_num, text, offset, offset + size)
+            offset += size
+    finally:
+        document.close()
+
+
+def _page_count(file_path):
+    document = fitz.open(file_path)
+    try:
+        return len(document)
+    finally:
+        document.close()
+
+
+def _extract_page_range(file_path, start, stop):
+    # Выполняется в отдельном процессе: у каждого процесса свой дескриптор PyMuPDF
+    document = fitz.open(file_path)
+    try:
+        return ''.join(document.load_page(page_num).get_text() for page_num in range(start, stop))
+    finally:
+        document.close()
+
+
+def _extract_text_parallel(file_path, workers, chunk_size):
+    page_count = _page_count(file_path)
+    starts = range(0, page_count, chunk_size)
+    stops = [min(start + chunk_size, page_count) for start in starts]
+    if len(starts) <= 1:
+        return _extract_page_range(file_path, 0, page_count)
+
+    # multiprocessing импортируется только при параллельном извлечении
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(starts))) as executor:
+        # map возвращает результаты в порядке диапазонов страниц
+        return ''.join(executor.map(_extract_page_range, repeat(file_path), starts, stops))
+
+
+@cached_extraction('pdf', version=1)
+def extract_text_from_pdf(file_path, workers=1, chunk_size=64):
+    # workers > 1 (или None — по числу ядер) включает параллельное извлечение:
+    # страницы делятся на диапазоны по chunk_size и обрабатываются в пуле процессов
+    try:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1 or chunk_size < 1:
+            raise ValueError("workers и chunk_size должны быть больше 0")
+        # Буфер пришлось бы копировать в каждый процесс, поэтому он извлекается в текущем
+        if workers > 1 and is_path(file_path):
+            return _extract_text_parallel(file_path, workers, chunk_size)
+        return ''.join(page.text for page in iter_pdf_pages(file_path))
     except Exception as e:
         print(f"Ошибка при чтении PDF: {e}")
         return ""
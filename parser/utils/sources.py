@@ -0,0 +1,133 @@
+import io
+import mmap
+import os
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# Источник документа для экстракторов: путь к файлу, байты (bytes, bytearray,
+# memoryview) или открытый двоичный файл. Буферы не копируются: экстракторы
+# работают с memoryview поверх исходных данных
+
+
+def is_path(source):
+    return isinstance(source, (str, os.PathLike))
+
+
+def is_buffer(source):
+    return isinstance(source, (bytes, bytearray, memoryview))
+
+
+def as_buffer(source):
+    # memoryview без копирования данных; файловый объект читается целиком,
+    # только если у него нет доступа к собственному буферу (как у BytesIO)
+    if is_buffer(source):
+        return memoryview(source).cast('B')
+    if isinstance(source, io.BytesIO):
+        return source.getbuffer()
+    return memoryview(source.read())
+
+
+@contextmanager
+def open_buffer(source):
+    # Путь отображается в память через mmap, поэтому файл не читается в кучу Python
+    if not is_path(source):
+        yield as_buffer(source)
+        return
+    with open(source, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            yield memoryview(b'')
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                yield view
+            finally:
+                view.release()
+
+
+class BufferReader(io.RawIOBase):
+    # Файловый объект только для чтения поверх memoryview: в отличие от BytesIO,
+    # не копирует bytearray и memoryview при создании
+    def __init__(self, buffer):
+        self._buffer = memoryview(buffer).cast('B')
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def readinto(self, target):
+        data = self._buffer[self._position:self._position + len(target)]
+        size = len(data)
+        target[:size] = data
+        self._position += size
+        return size
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += len(self._buffer)
+        if offset < 0:
+            raise ValueError("Отрицательная позиция в буфере")
+        self._position = offset
+        return offset
+
+    def tell(self):
+        return self._position
+
+
+def as_file(source):
+    # Путь возвращается как есть, буфер — как файловый объект без копирования
+    if is_path(source):
+        return source
+    if is_buffer(source):
+        return BufferReader(source)
+    return source
+
+
+@contextmanager
+def tool_input(source, suffix=''):
+    # Путь к данным для внешней утилиты (antiword, djvutxt) и дескрипторы,
+    # которые нужно передать процессу (pass_fds). Буфер записывается в memfd —
+    # файл в оперативной памяти, доступный процессу как /dev/fd/N; где memfd
+    # недоступен, используется временный файл
+    if is_path(source):
+        yield os.fspath(source), ()
+        return
+
+    with open_buffer(source) as buffer:
+        if hasattr(os, 'memfd_create') and sys.platform.startswith('linux'):
+            fd = os.memfd_create('parser-input', 0)
+            try:
+                _write_all(fd, buffer)
+                os.lseek(fd, 0, os.SEEK_SET)
+                yield f'/dev/fd/{fd}', (fd,)
+            finally:
+                os.close(fd)
+            return
+
+        file = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        try:
+            with file:
+                file.write(buffer)
+            yield file.name, ()
+        finally:
+            os.unlink(file.name)
+
+
+def _write_all(fd, buffer):
+    while buffer:
+        written = os.write(fd, buffer)
+        buffer = buffer[written:]
+
+
+def run_tool(args, pass_fds=()):
+    # Вывод внешней утилиты, запущенной для пути из tool_input. pass_fds нужны,
+    # только когда документ передан буфером через memfd
+    kwargs = {'pass_fds': pass_fds} if pass_fds else {}
+    return subprocess.run(args, stdout=subprocess.PIPE, check=True, **kwargs).stdout
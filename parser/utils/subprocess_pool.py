@@ -0,0 +1,235 @@
+import asyncio
+import os
+import threading
+import time
+import weakref
+from collections import deque, namedtuple
+
+from parser.utils import metrics
+
+# Результат запуска утилиты: код возврата, вывод, время работы в секундах
+# и описание ошибки (None, если запуск успешен)
+ToolResult = namedtuple('ToolResult', ['args', 'returncode', 'stdout', 'elapsed', 'error'])
+
+# Размер блока, которым читается вывод утилиты
+READ_SIZE = 64 * 1024
+
+# Сколько секунд ждать завершения процесса после kill()
+KILL_TIMEOUT = 5.0
+
+
+class ToolStats:
+    # Статистика времени работы одной утилиты по последним window запускам
+    def __init__(self, window=1024):
+        self.count = 0
+        self.failures = 0
+        self.timeouts = 0
+        self.total_time = 0.0
+        self._latencies = deque(maxlen=window)
+
+    def record(self, elapsed, error=None, timed_out=False):
+        self.count += 1
+        self.total_time += elapsed
+        self._latencies.append(elapsed)
+        if error is not None:
+            self.failures += 1
+        if timed_out:
+            self.timeouts += 1
+
+    def percentile(self, q):
+        if not self._latencies:
+            return 0.0
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def summary(self):
+        return {
+            'count': self.count,
+            'failures': self.failures,
+            'timeouts': self.timeouts,
+            'mean': self.total_time / self.count if self.count else 0.0,
+            'p50': self.percentile(0.5),
+            'p99': self.percentile(0.99),
+            'max': max(self._latencies, default=0.0),
+        }
+
+
+class OutputLimitExceeded(Exception):
+    pass
+
+
+class ToolPool:
+    # Ограниченный пул одновременных запусков внешних утилит (antiword, djvutxt)
+    # с тайм-аутом и ограничением размера вывода на каждый файл
+    def __init__(self, max_concurrency=None, timeout=60.0, max_output=64 * 1024 * 1024):
+        self.max_concurrency = max_concurrency or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_output = max_output
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    def _record(self, tool, elapsed, error=None, timed_out=False):
+        metrics.observe(tool, elapsed)
+        if error is not None:
+            metrics.increment(f'{tool}.failures')
+        with self._stats_lock:
+            self.stats.setdefault(tool, ToolStats()).record(elapsed, error, timed_out)
+
+    def latency_stats(self):
+        with self._stats_lock:
+            return {tool: stats.summary() for tool, stats in self.stats.items()}
+
+    async def _read_capped(self, stream, limit):
+        chunks = []
+        size = 0
+        while True:
+            chunk = await stream.read(READ_SIZE)
+            if not chunk:
+                return b''.join(chunks)
+            size += len(chunk)
+            if limit is not None and size > limit:
+                raise OutputLimitExceeded(f"Вывод превышает {limit} байт")
+            chunks.append(chunk)
+
+    async def _communicate(self, process, input):
+        # stdin пишется одновременно с чтением вывода: иначе утилита, заполнившая
+        # канал stdout, перестаёт читать stdin, и запись блокируется навсегда
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in (
+            self._read_capped(process.stdout, self.max_output),
+            self._read_capped(process.stderr, None),
+            _feed(process.stdin, input),
+        )]
+        try:
+            stdout, _, _ = await asyncio.gather(*tasks)
+        finally:
+            # При ошибке или отмене остальные чтения снимаются, чтобы _kill()
+            # мог дочитать каналы сам
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        await process.wait()
+        return stdout
+
+    async def run(self, args, input=None, timeout=None, pass_fds=()):
+        timeout = self.timeout if timeout is None else timeout
+        tool = os.path.basename(args[0])
+
+        async with self._semaphore():
+            started = time.perf_counter()
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *args,
+                    stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.PIPE,
+                    pass_fds=pass_fds,
+                )
+            except OSError as e:
+                elapsed = time.perf_counter() - started
+                self._record(tool, elapsed, error=e)
+                return ToolResult(args, None, b'', elapsed, str(e))
+
+            try:
+                stdout = await asyncio.wait_for(self._communicate(process, input), timeout)
+            except asyncio.TimeoutError:
+                await _kill(process)
+                elapsed = time.perf_counter() - started
+                error = f"Превышено время ожидания ({timeout} с)"
+                self._record(tool, elapsed, error=error, timed_out=True)
+                return ToolResult(args, None, b'', elapsed, error)
+            except OutputLimitExceeded as e:
+                await _kill(process)
+                elapsed = time.perf_counter() - started
+                self._record(tool, elapsed, error=e)
+                return ToolResult(args, None, b'', elapsed, str(e))
+            except BaseException:
+                # При отмене задачи процесс не должен остаться работать
+                await asyncio.shield(_kill(process))
+                raise
+
+            elapsed = time.perf_counter() - started
+            error = None
+            if process.returncode != 0:
+                error = f"{tool} завершился с кодом {process.returncode}"
+            self._record(tool, elapsed, error=error)
+            return ToolResult(args, process.returncode, stdout, elapsed, error)
+
+    async def run_many(self, args_list):
+        return await asyncio.gather(*(self.run(args) for args in args_list))
+
+    def map(self, args_list):
+        # Синхронный запуск набора команд; результаты в порядке args_list
+        return asyncio.run(self.run_many(list(args_list)))
+
+
+async def _feed(stream, input):
+    if input is None:
+        return
+    try:
+        stream.write(input)
+        await stream.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        # Утилита завершилась, не дочитав stdin; её код возврата проверяется отдельно
+        pass
+    finally:
+        stream.close()
+
+
+async def _discard(stream):
+    while await stream.read(READ_SIZE):
+        pass
+
+
+async def _kill(process, timeout=KILL_TIMEOUT):
+    if process.returncode is None:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            pass
+    # Вывод, оставшийся в каналах, дочитывается и отбрасывается: пока asyncio
+    # не получит конец stdout и stderr, wait() не возвращается. Ожидание
+    # ограничено на случай, если каналы унаследовал дочерний процесс утилиты
+    try:
+        await asyncio.wait_for(asyncio.gather(
+            _discard(process.stdout),
+            _discard(process.stderr),
+            process.wait(),
+        ), timeout)
+    except asyncio.TimeoutError:
+        pass
+
+
+_default_pool = None
+
+
+def get_tool_pool():
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ToolPool()
+    return _default_pool
+
+
+def tool_text(result, label):
+    # Текст из результата запуска утилиты; при ошибке запуска или декодирования — пустая строка
+    try:
+        if result.error:
+            raise RuntimeError(result.error)
+        return result.stdout.decode('utf-8')
+    except Exception as e:
+        print(f"Ошибка при чтении {label}: {e}")
+        return ""
+
+
+def extract_many(tool, label, file_paths, pool=None):
+    # Одновременная конвертация многих файлов утилитой tool; для файлов с ошибкой — пустая строка.
+    # Экстракторы импортируют эту функцию внутри своих функций: asyncio нужен только пакетному запуску
+    pool = pool or get_tool_pool()
+    return [tool_text(result, label) for result in pool.map([tool, file_path] for file_path in file_paths)]
@@ -1,53 +1,399 @@
-import spacy
-from langdetect import detect, LangDetectException
+import functools
+import re
+
 from parser.Exceptions import LanguageError
+from parser.utils import metrics
+from parser.utils.lazy_import import lazy_import
+from parser.utils.model_registry import MODELS, get_model
+from parser.utils.analysis_result import TokenTable
+from parser.utils.analysis_cache import analysis_key, get_analysis_cache
+
+# Профили анализа: какие компоненты конвейера spaCy отключаются.
+# Лемматизатору нужны части речи, поэтому tagger/morphologizer остаются во всех профилях.
+ANALYSIS_PROFILES = {
+    'full': (),
+    'full-syntax': ('ner',),
+    'pos': ('parser', 'ner', 'lemmatizer'),
+    'lemma-only': ('parser', 'ner'),
+}
+
+# spaCy и langdetect импортируются при первом анализе, а не при импорте модуля
+spacy = lazy_import('spacy')
+langdetect = lazy_import('langdetect')
+
+# Язык определяется по выборке из текста не длиннее DETECT_SAMPLE_CHARS символов,
+# собранной из DETECT_WINDOWS равномерно расположенных фрагментов
+DETECT_SAMPLE_CHARS = 2000
+DETECT_WINDOWS = 4
+
+# Абзацы короче этого числа символов наследуют язык предыдущего абзаца
+MIN_PARAGRAPH_CHARS = 40
+
+_PARAGRAPH_RE = re.compile(r'\n\s*\n')
+_SENTENCE_END_RE = re.compile(r'[.!?…]\s')
+
+# Размер фрагмента (в символах) для анализа длинных текстов по частям
+CHUNK_SIZE = 100000
+
+
+def sample_text(text, max_chars=DETECT_SAMPLE_CHARS, windows=DETECT_WINDOWS):
+    if len(text) <= max_chars:
+        return text
+    window = max_chars // windows
+    step = (len(text) - window) // max(windows - 1, 1)
+    parts = []
+    for index in range(windows):
+        start = index * step
+        part = text[start:start + window]
+        # Фрагменты обрезаются по границам слов
+        if start:
+            part = part.partition(' ')[2]
+        parts.append(part.rpartition(' ')[0] or part)
+    return ' '.join(parts)
+
 
-def analyze_text(text):
+def detect(text):
+    # Фиксированное зерно делает результат langdetect воспроизводимым
+    langdetect.DetectorFactory.seed = 0
+    return langdetect.detect(text)
+
+
+@functools.lru_cache(maxsize=4096)
+def _detect_sample(sample):
+    with metrics.timer('langdetect.detect'):
+        return detect(sample)
+
+
+def detect_language(text):
+    return _detect_sample(sample_text(text))
+
+
+def _prepare_text(text, language=None):
     # Проверка на пустой текст
     if not text.strip():
         raise LanguageError(message="Текст для анализа не может быть пустым.")
 
-    nlp = None
-    language = None
+    text = ' '.join(text.split())  # Очистка текста от лишних пробелов
+    if language is not None:
+        return text, language
 
     try:
         # Определение языка текста
-        text = ' '.join(text.split())  # Очистка текста от лишних пробелов
-        language = detect(text)
-    except LangDetectException as e:
+        language = detect_language(text)
+    except langdetect.LangDetectException as e:
         raise LanguageError(message=f"Не удалось определить язык текста: {str(e)}")
     except Exception as e:
         raise LanguageError(message=f"Ошибка при анализе языка: {str(e)}")
 
-    # Загрузка соответствующей модели spaCy
+    return text, language
+
+
+def _load_model(language):
+    # Загрузка соответствующей модели spaCy (из кэша, если уже загружена)
     try:
-        if language == 'en':
-            nlp = spacy.load("en_core_web_sm")
-        elif language == 'ru':
-            nlp = spacy.load("ru_core_news_sm")
-        else:
+        if language not in MODELS:
             raise LanguageError(message=f"Язык '{language}' не поддерживается")
+        return get_model(language)
+    except LanguageError:
+        raise
     except OSError as e:
         error_msg = (
             f"Модель для языка '{language}' не установлена!\n"
-            f"Выполните команду: python -m spacy download "
-            f"{'en_core_web_sm' if language == 'en' else 'ru_core_news_sm'}"
+            f"Выполните команду: python -m spacy download {MODELS[language]}"
         )
         raise RuntimeError(error_msg) from e
     except Exception as e:
         raise LanguageError(message=f"Ошибка загрузки модели: {str(e)}")
 
+
+def _disabled_components(profile):
+    try:
+        return list(ANALYSIS_PROFILES[profile])
+    except KeyError:
+        raise ValueError(f"Неизвестный профиль анализа: '{profile}'") from None
+
+
+def _doc_to_analysis(doc, compact=False):
+    if compact:
+        return TokenTable.from_doc(doc)
+
+    analyze = []
+    for token in doc:
+        analyze.append({
+            'text': token.text,
+            'lemma': token.lemma_,
+            'position': token.pos_,
+            'dependency': token.dep_
+        })
+    return analyze
+
+
+def _cached_result(table, compact):
+    return table if compact else table.to_list()
+
+
+def analyze_text(text, profile='full', compact=False, language=None):
+    # language позволяет пропустить определение языка, если он известен заранее
+    disable = _disabled_components(profile)
+    text, language = _prepare_text(text, language)
+    nlp = _load_model(language)
+
+    # Повторяющийся текст берётся из кэша результатов, если он включён
+    cache = get_analysis_cache()
+    if cache is not None:
+        key = analysis_key(text, language, nlp, profile)
+        table = cache.get(key)
+        if table is not None:
+            return _cached_result(table, compact)
+
     # Анализ текста
     try:
-        doc = nlp(text)
-        analyze = []
-        for token in doc:
-            analyze.append({
-                'text': token.text,
-                'lemma': token.lemma_,
-                'position': token.pos_,
-                'dependency': token.dep_
-            })
-        return analyze
+        with metrics.timer('spacy.nlp'):
+            doc = nlp(text, disable=disable)
+        if cache is None:
+            return _doc_to_analysis(doc, compact)
+        table = TokenTable.from_doc(doc)
+    except Exception as e:
+        raise LanguageError(message=f"Ошибка при анализе текста: {str(e)}")
+
+    cache.put(key, table)
+    return _cached_result(table, compact)
+
+
+def analyze_texts(texts, batch_size=64, n_process=1, window_size=1000, profile='full', compact=False,
+                  language=None, errors='raise'):
+    # Пакетный анализ: тексты читаются окнами по window_size, внутри окна
+    # группируются по языку и прогоняются через nlp.pipe. Результаты
+    # выдаются в том же порядке, что и входные тексты.
+    # errors='raise' — первая ошибка (пустой текст, неизвестный язык) прерывает анализ;
+    # errors='return' — вместо результата такого текста выдаётся экземпляр LanguageError,
+    # остальные тексты анализируются
+    return _analyze_pairs(((text, language) for text in texts),
+                          batch_size, n_process, window_size, profile, compact, errors)
+
+
+def _analyze_pairs(pairs, batch_size, n_process, window_size, profile, compact, errors='raise'):
+    if batch_size < 1 or n_process < 1 or window_size < 1:
+        raise ValueError("batch_size, n_process и window_size должны быть больше 0")
+    if errors not in ('raise', 'return'):
+        raise ValueError(f"Неизвестный режим обработки ошибок: '{errors}'")
+    return _iter_windows(pairs, batch_size, n_process, window_size, profile, compact, errors)
+
+
+def _iter_windows(pairs, batch_size, n_process, window_size, profile, compact, errors):
+    window = []
+    for pair in pairs:
+        window.append(pair)
+        if len(window) >= window_size:
+            yield from _analyze_window(window, batch_size, n_process, profile, compact, errors)
+            window = []
+    if window:
+        yield from _analyze_window(window, batch_size, n_process, profile, compact, errors)
+
+
+def _pipe(nlp, texts, batch_size, n_process, disable):
+    try:
+        docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=disable)
+        with metrics.timer('spacy.pipe'):
+            return list(docs)
+    except Exception as e:
+        raise LanguageError(message=f"Ошибка при анализе текста: {str(e)}")
+
+
+def _pipe_each(nlp, texts, disable):
+    # Пакет не удался: тексты анализируются по одному, чтобы ошибка
+    # досталась только тексту, который её вызвал
+    docs = []
+    for text in texts:
+        try:
+            docs.append(_pipe(nlp, [text], 1, 1, disable)[0])
+        except LanguageError as e:
+            docs.append(e)
+    return docs
+
+
+def _analyze_window(pairs, batch_size, n_process, profile, compact, errors):
+    disable = _disabled_components(profile)
+    cache = get_analysis_cache()
+    results = [None] * len(pairs)
+    groups = {}
+    for index, (text, language) in enumerate(pairs):
+        try:
+            text, language = _prepare_text(text, language)
+        except LanguageError as e:
+            if errors == 'raise':
+                raise
+            results[index] = e
+            continue
+        groups.setdefault(language, []).append((index, text))
+
+    for language, items in groups.items():
+        try:
+            nlp = _load_model(language)
+        except LanguageError as e:
+            if errors == 'raise':
+                raise
+            for index, _ in items:
+                results[index] = e
+            continue
+
+        keys = {}
+        if cache is not None:
+            pending = []
+            for index, text in items:
+                keys[index] = analysis_key(text, language, nlp, profile)
+                table = cache.get(keys[index])
+                if table is not None:
+                    results[index] = _cached_result(table, compact)
+                else:
+                    pending.append((index, text))
+            items = pending
+            if not items:
+                continue
+
+        texts = [text for _, text in items]
+        try:
+            docs = _pipe(nlp, texts, batch_size, n_process, disable)
+        except LanguageError:
+            if errors == 'raise':
+                raise
+            docs = _pipe_each(nlp, texts, disable)
+        for (index, _), doc in zip(items, docs):
+            if isinstance(doc, LanguageError):
+                results[index] = doc
+            elif cache is None:
+                results[index] = _doc_to_analysis(doc, compact)
+            else:
+                table = TokenTable.from_doc(doc)
+                cache.put(keys[index], table)
+                results[index] = _cached_result(table, compact)
+
+    return results
+
+
+def split_paragraphs(text):
+    return [paragraph for paragraph in _PARAGRAPH_RE.split(text) if paragraph.strip()]
+
+
+def iter_paragraph_spans(text, separator=_PARAGRAPH_RE):
+    # Границы (начало, конец) непустых абзацев в исходном тексте, без его изменения
+    start = 0
+    for match in separator.finditer(text):
+        if text[start:match.start()].strip():
+            yield start, match.start()
+        start = match.end()
+    if text[start:].strip():
+        yield start, len(text)
+
+
+def detect_paragraph_languages(paragraphs, min_chars=MIN_PARAGRAPH_CHARS):
+    # Язык определяется для каждого абзаца (или страницы) отдельно;
+    # по коротким абзацам язык ненадёжен, поэтому они наследуют язык предыдущего
+    languages = []
+    previous = None
+    for paragraph in paragraphs:
+        if previous is not None and len(paragraph.strip()) < min_chars:
+            languages.append(previous)
+            continue
+        try:
+            previous = detect_language(' '.join(paragraph.split()))
+        except langdetect.LangDetectException as e:
+            raise LanguageError(message=f"Не удалось определить язык текста: {str(e)}")
+        languages.append(previous)
+    return languages
+
+
+def analyze_text_by_paragraph(text, profile='full', compact=False, batch_size=64, n_process=1):
+    # Режим для документов на нескольких языках: каждый абзац анализируется
+    # моделью своего языка, токены всех абзацев возвращаются одним списком.
+    # text может быть строкой (делится на абзацы по пустым строкам) или списком страниц/абзацев
+    paragraphs = split_paragraphs(text) if isinstance(text, str) else [part for part in text if part.strip()]
+    if not paragraphs:
+        raise LanguageError(message="Текст для анализа не может быть пустым.")
+
+    languages = detect_paragraph_languages(paragraphs)
+    results = _analyze_pairs(zip(paragraphs, languages), batch_size, n_process, len(paragraphs), profile, compact)
+    if compact:
+        return TokenTable.from_tokens(token for result in results for token in result)
+    return [token for result in results for token in result]
+
+
+def _split_point(head, chunk_size):
+    # Граница фрагмента: конец абзаца, иначе конец предложения, иначе пробел
+    for pattern in (_PARAGRAPH_RE, _SENTENCE_END_RE):
+        matches = list(pattern.finditer(head))
+        if matches and matches[-1].end() > chunk_size // 2:
+            return matches[-1].end()
+    space = head.rfind(' ')
+    if space > chunk_size // 2:
+        return space + 1
+    return chunk_size
+
+
+def iter_text_chunks(text, chunk_size=CHUNK_SIZE):
+    # text — строка или поток строк (например, страницы документа).
+    # Выдаются пары (смещение от начала всего текста, фрагмент); в памяти
+    # одновременно находится не больше одного фрагмента и одной входной части
+    if chunk_size < 1:
+        raise ValueError("chunk_size должен быть больше 0")
+    pieces = [text] if isinstance(text, str) else text
+
+    offset = 0
+    parts = []
+    size = 0
+    for piece in pieces:
+        parts.append(piece)
+        size += len(piece)
+        if size <= chunk_size:
+            continue
+
+        buffer = ''.join(parts)
+        start = 0
+        while len(buffer) - start > chunk_size:
+            split = start + _split_point(buffer[start:start + chunk_size], chunk_size)
+            yield offset, buffer[start:split]
+            offset += split - start
+            start = split
+        parts = [buffer[start:]]
+        size = len(parts[0])
+
+    tail = ''.join(parts)
+    if tail:
+        yield offset, tail
+
+
+def analyze_text_chunked(text, chunk_size=CHUNK_SIZE, profile='full', language=None, batch_size=4):
+    # Анализ сколь угодно длинного текста по фрагментам. Токены выдаются потоком,
+    # в 'idx' — смещение токена в символах от начала всего исходного текста
+    disable = _disabled_components(profile)
+    chunks = (chunk for chunk in iter_text_chunks(text, chunk_size) if chunk[1].strip())
+
+    first = next(chunks, None)
+    if first is None:
+        raise LanguageError(message="Текст для анализа не может быть пустым.")
+    if language is None:
+        # Язык определяется по первому фрагменту
+        _, language = _prepare_text(first[1])
+    nlp = _load_model(language)
+
+    def all_chunks():
+        yield first[1], first[0]
+        for offset, chunk in chunks:
+            yield chunk, offset
+
+    try:
+        for doc, offset in nlp.pipe(all_chunks(), as_tuples=True, batch_size=batch_size, disable=disable):
+            for token in doc:
+                if token.is_space:
+                    continue
+                yield {
+                    'text': token.text,
+                    'lemma': token.lemma_,
+                    'position': token.pos_,
+                    'dependency': token.dep_,
+                    'idx': offset + token.idx,
+                }
+    except LanguageError:
+        raise
     except Exception as e:
         raise LanguageError(message=f"Ошибка при анализе текста: {str(e)}")
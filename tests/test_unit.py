@@ -1,15 +1,44 @@
 import pytest
-from unittest.mock import patch, MagicMock, mock_open
+from unittest.mock import patch, MagicMock
 import subprocess
-from parser.utils.pdf_extractor import extract_text_from_pdf
+from parser.utils.pdf_extractor import extract_text_from_pdf, iter_pdf_pages
 from parser.utils.docx_extractor import extract_text_from_docx
-from parser.utils.doc_extractor import extract_text_from_doc
-from parser.utils.djvu_extractor import extract_text_from_djvu
+from parser.utils.doc_extractor import extract_text_from_doc, extract_texts_from_doc
+from parser.utils.subprocess_pool import ToolPool, ToolResult
+from parser.utils.djvu_extractor import extract_text_from_djvu, iter_djvu_pages
 from parser.utils.html_extractor import parse_html
-from parser.utils.text_analyzer import analyze_text
+from parser.utils.html_crawler import HtmlCrawler, crawl_urls
+from parser.utils.html_extractor import extract_paragraphs
+from parser.utils.html_backends import detect_encoding, iter_paragraphs
+from parser.utils.dispatcher import extract, register_format, sniff_format, unregister_format
+from parser.batch import collect_files, run_batch
+from config import RECOURSE_DIR
+import json
+import os
+from parser.utils.text_analyzer import analyze_text, analyze_texts, _detect_sample
+from parser.utils.text_analyzer import analyze_text_by_paragraph, sample_text
+from parser.utils.text_analyzer import analyze_text_chunked, iter_text_chunks
+from parser.utils.model_registry import ModelRegistry, registry
+from parser.utils.analysis_result import TokenTable
+from parser.utils.cache_store import SqliteCacheStore
+from parser.utils.extraction_cache import set_extraction_cache
+from parser.utils.analysis_cache import AnalysisCache, set_analysis_cache
 from parser.Exceptions import LanguageError
 from langdetect.lang_detect_exception import LangDetectException
 
+
+@pytest.fixture(autouse=True)
+def clear_model_registry():
+    """
+    Сбрасывает кэш моделей spaCy и кэш определения языка до и после каждого теста,
+    чтобы замоканные модели и результаты не переходили между тестами.
+    """
+    registry.clear()
+    _detect_sample.cache_clear()
+    yield
+    registry.clear()
+    _detect_sample.cache_clear()
+
 # Тесты для извлечения текста из PDF файлов
 def test_extract_text_from_pdf_success():
     """
@@ -68,7 +97,7 @@ def test_extract_text_from_doc_success():
     mock_process = MagicMock()
     mock_process.stdout = b"Test text"
     
-    with patch('parser.utils.doc_extractor.subprocess.run', return_value=mock_process):
+    with patch('parser.utils.sources.subprocess.run', return_value=mock_process):
         result = extract_text_from_doc("test_sample.doc")
         assert result == "Test text"
 
@@ -77,7 +106,7 @@ def test_extract_text_from_doc_error():
     Проверяет обработку ошибки при чтении DOC файла.
     Тест проверяет, что функция возвращает пустую строку при возникновении исключения.
     """
-    with patch('parser.utils.doc_extractor.subprocess.run', side_effect=Exception("Test error")):
+    with patch('parser.utils.sources.subprocess.run', side_effect=Exception("Test error")):
         result = extract_text_from_doc("test_sample.doc")
         assert result == ""
 
@@ -90,19 +119,18 @@ def test_extract_text_from_djvu_success():
     mock_process = MagicMock()
     mock_process.stdout = b"Test text"
     
-    with patch('parser.utils.djvu_extractor.subprocess.run', return_value=mock_process) as mock_run:
-        with patch('builtins.open', mock_open(read_data="Test text")):
-            result = extract_text_from_djvu("test_sample.djvu")
-            assert result == "Test text"
-            mock_run.assert_called_once_with(['djvutxt', 'test_sample.djvu', 'output.txt'], 
-                                           stdout=subprocess.PIPE, check=True)
+    with patch('parser.utils.sources.subprocess.run', return_value=mock_process) as mock_run:
+        result = extract_text_from_djvu("test_sample.djvu")
+        assert result == "Test text"
+        mock_run.assert_called_once_with(['djvutxt', 'test_sample.djvu'],
+                                         stdout=subprocess.PIPE, check=True)
 
 def test_extract_text_from_djvu_error():
     """
     Проверяет обработку ошибки при чтении DJVU файла.
     Тест проверяет, что функция возвращает пустую строку при возникновении исключения.
     """
-    with patch('parser.utils.djvu_extractor.subprocess.run', side_effect=Exception("Test error")):
+    with patch('parser.utils.sources.subprocess.run', side_effect=Exception("Test error")):
         result = extract_text_from_djvu("test_sample.djvu")
         assert result == ""
 
@@ -421,6 +449,1794 @@ def test_extract_text_from_doc_encoding_error():
     Проверяет обработку ошибки кодировки при чтении DOC файла.
     Граничный случай: файл имеет неверную кодировку.
     """
-    with patch('parser.utils.doc_extractor.subprocess.run', side_effect=UnicodeDecodeError("utf-8", b"", 0, 1, "invalid continuation byte")):
+    with patch('parser.utils.sources.subprocess.run', side_effect=UnicodeDecodeError("utf-8", b"", 0, 1, "invalid continuation byte")):
         result = extract_text_from_doc("invalid_encoding.doc")
-        assert result == "" 
\ No newline at end of file
+        assert result == "" 
+
+# Тесты для кэша моделей spaCy
+def test_model_registry_loads_model_once():
+    """
+    Проверяет, что повторные вызовы analyze_text не загружают модель заново.
+    """
+    mock_doc = MagicMock()
+    mock_doc.__iter__.return_value = []
+
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.return_value = mock_doc
+            analyze_text("Hello")
+            analyze_text("World")
+            mock_spacy.assert_called_once_with("en_core_web_sm")
+
+def test_model_registry_preload():
+    """
+    Проверяет предварительную загрузку моделей для выбранных языков.
+    """
+    models = ModelRegistry()
+    with patch('parser.utils.model_registry.spacy.load') as mock_spacy:
+        models.preload(['en', 'ru'])
+        assert mock_spacy.call_count == 2
+        assert models.loaded() == ['en_core_web_sm', 'ru_core_news_sm']
+
+def test_model_registry_lru_limit():
+    """
+    Проверяет, что при ограничении max_models вытесняется давно не использованная модель.
+    """
+    models = ModelRegistry(max_models=1)
+    with patch('parser.utils.model_registry.spacy.load') as mock_spacy:
+        models.get('en')
+        models.get('ru')
+        assert models.loaded() == ['ru_core_news_sm']
+        models.get('en')
+        assert mock_spacy.call_count == 3
+
+def test_model_registry_thread_safe():
+    """
+    Проверяет, что при одновременных запросах из потоков модель загружается один раз.
+    """
+    import threading
+    import time
+
+    models = ModelRegistry()
+    results = []
+
+    def slow_load(name):
+        time.sleep(0.05)
+        return MagicMock(name=name)
+
+    with patch('parser.utils.model_registry.spacy.load', side_effect=slow_load) as mock_spacy:
+        threads = [threading.Thread(target=lambda: results.append(models.get('ru'))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert mock_spacy.call_count == 1
+        assert all(result is results[0] for result in results)
+
+
+# Тесты для пакетного анализа текстов
+def make_doc(*words):
+    tokens = []
+    for word in words:
+        token = MagicMock()
+        token.text = word
+        token.lemma_ = word.lower()
+        token.pos_ = "NOUN"
+        token.dep_ = "ROOT"
+        tokens.append(token)
+    return tokens
+
+def test_analyze_texts_keeps_input_order():
+    """
+    Проверяет, что тексты разных языков группируются по языку,
+    но результаты возвращаются в порядке входных данных.
+    """
+    languages = {"Hello": 'en', "Привет": 'ru', "World": 'en'}
+    models = {
+        "en_core_web_sm": MagicMock(),
+        "ru_core_news_sm": MagicMock(),
+    }
+    for nlp in models.values():
+        nlp.pipe.side_effect = lambda texts, **kwargs: [make_doc(text) for text in texts]
+
+    with patch('parser.utils.text_analyzer.detect', side_effect=lambda text: languages[text]):
+        with patch('parser.utils.text_analyzer.spacy.load', side_effect=lambda name: models[name]):
+            result = list(analyze_texts(["Hello", "Привет", "World"], batch_size=8, n_process=2))
+
+    assert [analyze[0]['text'] for analyze in result] == ["Hello", "Привет", "World"]
+    assert models["en_core_web_sm"].pipe.call_count == 1
+    assert models["en_core_web_sm"].pipe.call_args.kwargs == {'batch_size': 8, 'n_process': 2, 'disable': []}
+
+def test_analyze_texts_windows():
+    """
+    Проверяет, что входной поток обрабатывается окнами заданного размера.
+    """
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.pipe.side_effect = lambda texts, **kwargs: [make_doc(text) for text in texts]
+            result = list(analyze_texts((f"word{i}" for i in range(5)), window_size=2))
+            assert len(result) == 5
+            assert mock_spacy.return_value.pipe.call_count == 3
+            assert result[4][0]['text'] == "word4"
+
+def test_analyze_texts_empty_text():
+    """
+    Проверяет, что пустой текст в пакете вызывает LanguageError.
+    """
+    with pytest.raises(LanguageError) as exc_info:
+        list(analyze_texts(["   "]))
+    assert exc_info.value.message == "Текст для анализа не может быть пустым."
+
+def test_analyze_texts_return_errors():
+    """
+    Проверяет, что с errors='return' ошибка одного текста выдаётся как его результат,
+    а остальные тексты окна анализируются; сбой пакета разбирается по одному тексту.
+    """
+    def fake_pipe(texts, **kwargs):
+        texts = list(texts)
+        if "boom" in texts:
+            raise RuntimeError("Сбой модели")
+        return [make_doc(text) for text in texts]
+
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.pipe.side_effect = fake_pipe
+            result = list(analyze_texts(["Hello", "", "boom", "World"], errors='return'))
+
+    assert result[0][0]['text'] == "Hello"
+    assert result[1].message == "Текст для анализа не может быть пустым."
+    assert result[2].message == "Ошибка при анализе текста: Сбой модели"
+    assert result[3][0]['text'] == "World"
+    with pytest.raises(ValueError):
+        analyze_texts(["Hello"], errors='ignore')
+
+
+# Тесты для профилей анализа
+@pytest.mark.parametrize("profile,expected_disable", [
+    ('full', []),
+    ('full-syntax', ['ner']),
+    ('pos', ['parser', 'ner', 'lemmatizer']),
+    ('lemma-only', ['parser', 'ner']),
+])
+def test_analyze_text_profiles(profile, expected_disable):
+    """
+    Проверяет, что профиль анализа отключает лишние компоненты конвейера spaCy.
+    """
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.return_value = make_doc("Test")
+            result = analyze_text("Test", profile=profile)
+            mock_spacy.return_value.assert_called_once_with("Test", disable=expected_disable)
+            assert result[0]['text'] == "Test"
+
+def test_analyze_text_unknown_profile():
+    """
+    Проверяет, что неизвестный профиль анализа вызывает ValueError.
+    """
+    with pytest.raises(ValueError):
+        analyze_text("Test", profile='unknown')
+
+
+# Тесты для компактного формата результата анализа
+def test_analyze_text_compact():
+    """
+    Проверяет, что компактный результат ведёт себя как список словарей
+    и хранит повторяющиеся строки один раз.
+    """
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.return_value = make_doc("Word", "word", "Word")
+            result = analyze_text("Word word Word", compact=True)
+
+    assert isinstance(result, TokenTable)
+    assert len(result) == 3
+    assert [token['text'] for token in result] == ["Word", "word", "Word"]
+    assert result[-1]['lemma'] == "word"
+    assert dict(result[0]) == {'text': "Word", 'lemma': "word", 'position': "NOUN", 'dependency': "ROOT"}
+    assert result.strings == ["Word", "word", "NOUN", "ROOT"]
+
+def test_token_table_bytes_roundtrip():
+    """
+    Проверяет сериализацию компактного результата в двоичный вид и обратно.
+    """
+    tokens = [
+        {'text': "жжилой", 'lemma': "жилой", 'position': "ADJ", 'dependency': "amod"},
+        {'text': "дом", 'lemma': "дом", 'position': "NOUN", 'dependency': "ROOT"},
+    ]
+    table = TokenTable.from_tokens(tokens)
+    restored = TokenTable.from_bytes(table.to_bytes())
+
+    assert restored.to_list() == tokens
+    assert restored == table
+
+def test_token_table_bad_bytes():
+    """
+    Проверяет, что некорректные данные не принимаются при десериализации.
+    """
+    with pytest.raises(ValueError):
+        TokenTable.from_bytes(b"XXXX" + bytes(8))
+
+
+# Тесты для постраничного извлечения текста из PDF
+def make_pdf_document(*texts):
+    mock_document = MagicMock()
+    pages = []
+    for text in texts:
+        mock_page = MagicMock()
+        mock_page.get_text.return_value = text
+        pages.append(mock_page)
+    mock_document.load_page.side_effect = lambda page_num: pages[page_num]
+    mock_document.__len__.return_value = len(pages)
+    return mock_document
+
+def test_iter_pdf_pages_offsets():
+    """
+    Проверяет, что страницы выдаются по порядку с номерами и смещениями в байтах.
+    """
+    mock_document = make_pdf_document("Страница\n", "Page 2\n")
+
+    with patch('parser.utils.pdf_extractor.fitz.open', return_value=mock_document):
+        pages = list(iter_pdf_pages("test_sample.pdf"))
+
+    assert [page.number for page in pages] == [0, 1]
+    assert (pages[0].start, pages[0].end) == (0, 17)
+    assert (pages[1].start, pages[1].end) == (17, 24)
+    mock_document.close.assert_called_once()
+
+def test_iter_pdf_pages_closes_on_break():
+    """
+    Проверяет, что документ закрывается, если обход страниц прерван.
+    """
+    mock_document = make_pdf_document("one", "two", "three")
+
+    with patch('parser.utils.pdf_extractor.fitz.open', return_value=mock_document):
+        pages = iter_pdf_pages("test_sample.pdf")
+        assert next(pages).text == "one"
+        pages.close()
+
+    mock_document.close.assert_called_once()
+    assert mock_document.load_page.call_count == 1
+
+
+# Тесты для параллельного извлечения текста из PDF
+def test_extract_text_from_pdf_parallel(tmp_path):
+    """
+    Проверяет, что при разбиении страниц между процессами текст
+    собирается в исходном порядке страниц.
+    """
+    import fitz
+
+    file_path = str(tmp_path / "pages.pdf")
+    document = fitz.open()
+    for page_num in range(5):
+        page = document.new_page()
+        page.insert_text((72, 72), f"Page {page_num}")
+    document.save(file_path)
+    document.close()
+
+    sequential = extract_text_from_pdf(file_path)
+    parallel = extract_text_from_pdf(file_path, workers=2, chunk_size=2)
+
+    assert parallel == sequential
+    assert [line for line in parallel.split() if line.isdigit()] == ['0', '1', '2', '3', '4']
+
+def test_extract_text_from_pdf_parallel_bad_arguments():
+    """
+    Проверяет, что некорректный размер диапазона страниц приводит к пустому результату.
+    """
+    result = extract_text_from_pdf("test_sample.pdf", workers=2, chunk_size=0)
+    assert result == ""
+
+
+# Тесты для кэша извлечённого текста
+@pytest.fixture
+def extraction_cache(tmp_path):
+    cache = SqliteCacheStore(str(tmp_path / "cache.sqlite"))
+    set_extraction_cache(cache)
+    yield cache
+    set_extraction_cache(None)
+    cache.close()
+
+def test_extraction_cache_hit(tmp_path, extraction_cache):
+    """
+    Проверяет, что повторное извлечение неизменённого файла берётся из кэша
+    без повторного открытия документа.
+    """
+    file_path = tmp_path / "sample.pdf"
+    file_path.write_bytes(b"%PDF-1.4 test")
+    mock_document = make_pdf_document("Test text")
+
+    with patch('parser.utils.pdf_extractor.fitz.open', return_value=mock_document) as mock_open_pdf:
+        assert extract_text_from_pdf(str(file_path)) == "Test text"
+        assert extract_text_from_pdf(str(file_path)) == "Test text"
+        assert mock_open_pdf.call_count == 1
+
+    assert extraction_cache.hits == 1
+    assert extraction_cache.misses == 1
+
+def test_extraction_cache_keyed_by_content(tmp_path, extraction_cache):
+    """
+    Проверяет, что изменение содержимого файла приводит к повторному извлечению,
+    а ошибки извлечения не кэшируются.
+    """
+    file_path = tmp_path / "sample.doc"
+    file_path.write_bytes(b"first")
+    mock_process = MagicMock()
+    mock_process.stdout = b"Test text"
+
+    with patch('parser.utils.sources.subprocess.run', side_effect=Exception("Test error")):
+        assert extract_text_from_doc(str(file_path)) == ""
+    with patch('parser.utils.sources.subprocess.run', return_value=mock_process) as mock_run:
+        assert extract_text_from_doc(str(file_path)) == "Test text"
+        file_path.write_bytes(b"second")
+        assert extract_text_from_doc(str(file_path)) == "Test text"
+        assert mock_run.call_count == 2
+
+def test_cache_store_lru_eviction(tmp_path):
+    """
+    Проверяет вытеснение давно не использованных записей при превышении объёма.
+    """
+    cache = SqliteCacheStore(str(tmp_path / "cache.sqlite"), max_bytes=10)
+    cache.put("a", b"12345")
+    cache.put("b", b"12345")
+    cache.get("a")
+    cache.put("c", b"12345")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"12345"
+    assert cache.stats()['evictions'] == 1
+    assert cache.stats()['bytes'] == 10
+    cache.close()
+
+
+# Тесты для кэша результатов анализа
+@pytest.fixture
+def analysis_cache():
+    cache = AnalysisCache(max_entries=2)
+    set_analysis_cache(cache)
+    yield cache
+    set_analysis_cache(None)
+
+def test_analysis_cache_normalised_text(analysis_cache):
+    """
+    Проверяет, что текст, отличающийся только пробелами, анализируется один раз.
+    """
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.return_value = make_doc("Legal", "footer")
+            first = analyze_text("Legal footer")
+            second = analyze_text("  Legal \n footer ")
+            assert mock_spacy.return_value.call_count == 1
+
+    assert first == second
+    assert second[0]['text'] == "Legal"
+    assert analysis_cache.stats()['hits'] == 1
+
+def test_analysis_cache_key_includes_profile(analysis_cache):
+    """
+    Проверяет, что результаты разных профилей анализа кэшируются отдельно.
+    """
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.return_value = make_doc("Header")
+            analyze_text("Header", profile='full')
+            analyze_text("Header", profile='lemma-only')
+            assert mock_spacy.return_value.call_count == 2
+
+def test_analysis_cache_batch(analysis_cache):
+    """
+    Проверяет, что при пакетном анализе повторяющиеся тексты не передаются в nlp.pipe.
+    """
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.pipe.side_effect = lambda texts, **kwargs: [make_doc(text) for text in texts]
+            list(analyze_texts(["Header", "Body"]))
+            result = list(analyze_texts(["Header", "Footer"], compact=True))
+            assert mock_spacy.return_value.pipe.call_count == 2
+
+    assert [table[0]['text'] for table in result] == ["Header", "Footer"]
+    assert analysis_cache.hits == 1
+
+def test_analysis_cache_persistent_store(tmp_path):
+    """
+    Проверяет, что результаты из постоянного хранилища доступны новому кэшу.
+    """
+    store = SqliteCacheStore(str(tmp_path / "analysis.sqlite"))
+    table = TokenTable.from_tokens([{'text': "дом", 'lemma': "дом", 'position': "NOUN", 'dependency': "ROOT"}])
+    AnalysisCache(store=store).put("key", table)
+
+    restored = AnalysisCache(store=store).get("key")
+    assert restored == table
+    store.close()
+
+
+# Тесты для постраничного и параллельного извлечения текста из DJVU
+def fake_djvu_tools(args, **kwargs):
+    process = MagicMock()
+    if args[0] == 'djvused':
+        process.stdout = b"3\n"
+    elif args[1].startswith('--page='):
+        process.stdout = f"Page {args[1][len('--page='):]}\n".encode('utf-8')
+    else:
+        process.stdout = b"Page 1\nPage 2\nPage 3\n"
+    return process
+
+def test_iter_djvu_pages():
+    """
+    Проверяет постраничное извлечение текста из DJVU через djvutxt --page.
+    """
+    with patch('parser.utils.sources.subprocess.run', side_effect=fake_djvu_tools) as mock_run:
+        pages = list(iter_djvu_pages("test_sample.djvu"))
+
+    assert [page.number for page in pages] == [0, 1, 2]
+    assert pages[2].text == "Page 3\n"
+    assert mock_run.call_args_list[1].args[0] == ['djvutxt', '--page=1', 'test_sample.djvu']
+
+def test_extract_text_from_djvu_parallel():
+    """
+    Проверяет, что при параллельном извлечении страницы собираются по порядку.
+    """
+    with patch('parser.utils.sources.subprocess.run', side_effect=fake_djvu_tools):
+        sequential = extract_text_from_djvu("test_sample.djvu")
+        parallel = extract_text_from_djvu("test_sample.djvu", workers=3)
+
+    assert parallel == sequential
+
+
+# Тесты для асинхронной загрузки страниц
+@pytest.fixture
+def local_site():
+    """
+    Локальный HTTP-сервер, заменяющий настоящие сайты.
+    """
+    import threading
+    import time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    state = {'flaky': 0, 'active': 0, 'max_active': 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_page(self, status, body=b"", headers=None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == '/page':
+                if self.headers.get('If-None-Match') == '"v1"':
+                    self.send_page(304)
+                else:
+                    self.send_page(200, "<p>Первый абзац</p><p>Second</p>".encode('utf-8'),
+                                   {'ETag': '"v1"', 'Content-Type': 'text/html; charset=utf-8'})
+            elif self.path == '/flaky':
+                state['flaky'] += 1
+                if state['flaky'] == 1:
+                    self.send_page(503)
+                else:
+                    self.send_page(200, b"<p>Recovered</p>")
+            elif self.path == '/cp1251':
+                text = "Съешь же ещё этих мягких французских булок, да выпей чаю."
+                self.send_page(200, f"<p>{text}</p>".encode('cp1251') * 3, {'Content-Type': 'text/html'})
+            elif self.path.startswith('/slow'):
+                with lock:
+                    state['active'] += 1
+                    state['max_active'] = max(state['max_active'], state['active'])
+                time.sleep(0.05)
+                with lock:
+                    state['active'] -= 1
+                self.send_page(200, b"<p>Slow</p>")
+            else:
+                self.send_page(404)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_port}", state
+    server.shutdown()
+    server.server_close()
+
+def test_crawler_extracts_paragraphs_and_retries(local_site):
+    """
+    Проверяет загрузку нескольких страниц, повтор после ошибки 503
+    и обработку отсутствующей страницы.
+    """
+    base_url, state = local_site
+    results = crawl_urls([f"{base_url}/page", f"{base_url}/flaky", f"{base_url}/missing"], backoff=0.01)
+    by_url = {result.url: result for result in results}
+
+    assert by_url[f"{base_url}/page"].text == "Первый абзац Second"
+    assert by_url[f"{base_url}/flaky"].text == "Recovered"
+    assert state['flaky'] == 2
+    assert by_url[f"{base_url}/missing"].status == 404
+    assert by_url[f"{base_url}/missing"].text is None
+
+def test_crawler_detects_undeclared_encoding(local_site):
+    """
+    Проверяет, что кодировка страницы без charset в заголовке и <meta>
+    определяется по содержимому.
+    """
+    base_url, _ = local_site
+    [result] = crawl_urls([f"{base_url}/cp1251"])
+
+    assert result.text == " ".join(["Съешь же ещё этих мягких французских булок, да выпей чаю."] * 3)
+
+def test_crawler_conditional_get(local_site):
+    """
+    Проверяет, что повторный запрос отправляется с ETag и при ответе 304
+    возвращается ранее извлечённый текст.
+    """
+    import asyncio
+
+    base_url, _ = local_site
+
+    async def fetch_twice():
+        async with HtmlCrawler() as crawler:
+            first = await crawler.fetch(f"{base_url}/page")
+            second = await crawler.fetch(f"{base_url}/page")
+            return first, second
+
+    first, second = asyncio.run(fetch_twice())
+    assert not first.not_modified
+    assert second.status == 304 and second.not_modified
+    assert second.text == first.text
+
+def test_crawler_per_host_limit(local_site):
+    """
+    Проверяет ограничение числа одновременных запросов к одному хосту.
+    """
+    base_url, state = local_site
+    results = crawl_urls([f"{base_url}/slow{i}" for i in range(6)], per_host_limit=2)
+
+    assert len(results) == 6
+    assert all(result.text == "Slow" for result in results)
+    assert state['max_active'] <= 2
+
+
+# Тесты для парсеров HTML и определения кодировки
+def test_detect_encoding_fast_path():
+    """
+    Проверяет, что кодировка берётся из заголовка или <meta charset>
+    без медленного определения по содержимому.
+    """
+    fallback = MagicMock(return_value='ascii')
+    html = '<html><head><meta charset="windows-1251"></head><p>Привет</p></html>'.encode('cp1251')
+
+    assert detect_encoding(b"<p>x</p>", 'text/html; charset=KOI8-R', fallback) == 'koi8-r'
+    assert detect_encoding(html, 'text/html', fallback) == 'cp1251'
+    fallback.assert_not_called()
+    assert detect_encoding(b"<p>x</p>", None, fallback) == 'ascii'
+
+@pytest.mark.parametrize("backend", ['html.parser', 'lxml'])
+def test_extract_paragraphs_backends(backend):
+    """
+    Проверяет, что разные парсеры HTML извлекают одинаковый текст абзацев.
+    """
+    html = "<html><body><div><p>Первый <b>абзац</b></p></div><span>skip</span><p> Второй </p></body></html>"
+    assert extract_paragraphs(html, backend) == "Первый абзац Второй"
+
+def test_extract_paragraphs_unknown_backend():
+    """
+    Проверяет, что неизвестный парсер HTML вызывает ValueError.
+    """
+    with pytest.raises(ValueError):
+        extract_paragraphs("<p>Test</p>", 'unknown')
+
+@pytest.mark.parametrize("backend", ['html.parser', 'lxml'])
+def test_iter_paragraphs_incremental(backend):
+    """
+    Проверяет потоковое извлечение абзацев, когда страница приходит
+    мелкими фрагментами, разрывающими многобайтовые символы.
+    """
+    html = '<meta charset="utf-8"><p>Первый абзац</p><p>Second &amp; last</p>'.encode('utf-8')
+    chunks = [html[i:i + 7] for i in range(0, len(html), 7)]
+
+    paragraphs = iter_paragraphs(iter(chunks), backend=backend)
+    assert next(paragraphs) == "Первый абзац"
+    assert list(paragraphs) == ["Second & last"]
+
+@pytest.mark.parametrize("backend", ['html.parser', 'lxml'])
+def test_iter_paragraphs_detects_encoding_across_chunks(backend):
+    """
+    Проверяет, что <meta charset> находится, даже если первый фрагмент
+    обрывается до него, а без объявления кодировка определяется по содержимому.
+    """
+    page = '<html><head><meta charset="windows-1251"></head><body><p>Привет мир</p></body></html>'.encode('cp1251')
+    assert list(iter_paragraphs([page[:16], page[16:]], backend=backend)) == ["Привет мир"]
+
+    bare = '<html><body><p>Привет мир</p></body></html>'.encode('cp1251')
+    fallback = MagicMock(return_value='cp1251')
+    assert list(iter_paragraphs([bare[:10], bare[10:]], backend=backend, fallback=fallback)) == ["Привет мир"]
+    fallback.assert_called_once_with(bare)
+
+    text = "Съешь же ещё этих мягких французских булок, да выпей чаю."
+    detected = ('<html><body>' + f'<p>{text}</p>' * 3 + '</body></html>').encode('cp1251')
+    assert list(iter_paragraphs([detected[:8], detected[8:]], backend=backend)) == [text] * 3
+
+def test_iter_paragraphs_unknown_streaming_backend():
+    """
+    Проверяет, что парсер без потокового разбора вызывает ValueError, а не заменяется молча.
+    """
+    for backend in ('selectolax', 'nonsense'):
+        with pytest.raises(ValueError):
+            list(iter_paragraphs([b"<p>Test</p>"], backend=backend))
+
+def test_iter_paragraphs_lxml_releases_tree():
+    """
+    Проверяет, что при потоковом разборе lxml прочитанные элементы
+    не накапливаются в дереве страницы.
+    """
+    from lxml import etree
+
+    roots = []
+
+    class RecordingParser(etree.HTMLPullParser):
+        def close(self):
+            root = super().close()
+            roots.append(root)
+            return root
+
+    html = ('<html><body>' + '<div><p>Абзац <b>жирный</b></p><table><tr><td>x</td></tr></table></div>' * 2000
+            + '</body></html>').encode('utf-8')
+    with patch('lxml.etree.HTMLPullParser', RecordingParser):
+        paragraphs = list(iter_paragraphs([html[i:i + 4096] for i in range(0, len(html), 4096)], backend='lxml'))
+
+    assert paragraphs == ["Абзац жирный"] * 2000
+    assert sum(1 for _ in roots[0].iter()) < 10
+
+@pytest.mark.parametrize("backend", ['html.parser', 'lxml'])
+def test_extract_paragraphs_xhtml_declaration(backend):
+    """
+    Проверяет разбор страницы XHTML, начинающейся с XML-объявления.
+    """
+    html = '<?xml version="1.0" encoding="utf-8"?>\n<html><body><p>Абзац XHTML</p></body></html>'
+    assert extract_paragraphs(html, backend) == "Абзац XHTML"
+
+
+# Тесты для определения формата по содержимому
+@pytest.mark.parametrize("file_name,expected_format", [
+    ('6.pdf', 'pdf'),
+    ('6.docx', 'docx'),
+    ('6.doc', 'doc'),
+    ('6.djvu', 'djvu'),
+    ('8.doc', 'docx'),  # файл с расширением .doc на самом деле является DOCX
+    ('9.zip', None),
+])
+def test_sniff_format(file_name, expected_format):
+    """
+    Проверяет, что формат определяется по сигнатуре, а не по расширению файла.
+    """
+    assert sniff_format(os.path.join(RECOURSE_DIR, file_name)) == expected_format
+
+def test_extract_rejects_unknown_format():
+    """
+    Проверяет, что zip-архив без документа Word не извлекается.
+    """
+    assert extract(os.path.join(RECOURSE_DIR, '9.zip')) is None
+
+def test_extract_routes_bytes():
+    """
+    Проверяет, что содержимое файла в байтах направляется нужному экстрактору.
+    """
+    with open(os.path.join(RECOURSE_DIR, '6.pdf'), 'rb') as file:
+        data = file.read()
+
+    with patch('parser.utils.pdf_extractor.fitz.open', return_value=make_pdf_document("Test text")) as mock_open_pdf:
+        assert extract(data) == "Test text"
+        # PDF открывается как поток поверх буфера, без временного файла
+        assert bytes(mock_open_pdf.call_args.kwargs['stream']) == data
+        assert mock_open_pdf.call_args.kwargs['filetype'] == 'pdf'
+
+def test_register_custom_format():
+    """
+    Проверяет подключение стороннего формата через реестр.
+    """
+    register_format('txt', lambda header, source: header.startswith(b'TXT:'), lambda path: "custom")
+    try:
+        assert sniff_format(b"TXT: hello") == 'txt'
+        assert extract(b"TXT: hello") == "custom"
+    finally:
+        unregister_format('txt')
+    assert sniff_format(b"TXT: hello") is None
+
+
+# Тесты для пакетной обработки каталогов
+def fake_analyze(text, profile='full', compact=False):
+    if text == "bad":
+        raise LanguageError(message="Язык 'xx' не поддерживается")
+    return TokenTable.from_tokens([{'text': text, 'lemma': text, 'position': "NOUN", 'dependency': "ROOT"}])
+
+@pytest.fixture
+def corpus(tmp_path):
+    corpus_dir = tmp_path / "corpus"
+    (corpus_dir / "nested").mkdir(parents=True)
+    (corpus_dir / "a.pdf").write_text("good")
+    (corpus_dir / "nested" / "b.docx").write_text("bad")
+    (corpus_dir / "c.doc").write_text("")
+    return corpus_dir
+
+def test_collect_files(corpus):
+    """
+    Проверяет обход каталогов и раскрытие шаблонов glob без повторов.
+    """
+    files = collect_files([str(corpus), str(corpus / "*.pdf")])
+    assert [os.path.basename(path) for path in files] == ["a.pdf", "c.doc", "b.docx"]
+
+def test_run_batch_records_and_resume(tmp_path, corpus):
+    """
+    Проверяет запись результатов и ошибок в JSONL и продолжение по манифесту:
+    повторный запуск не обрабатывает уже обработанные файлы.
+    """
+    output = tmp_path / "out.jsonl"
+    checkpoint = tmp_path / "manifest.jsonl"
+    read_file = lambda path: open(path).read()
+
+    with patch('parser.batch.extract', side_effect=read_file) as mock_extract, \
+            patch('parser.batch.sniff_format', return_value='pdf'), \
+            patch('parser.batch.analyze_text', side_effect=fake_analyze):
+        summary = run_batch([str(corpus)], str(output), checkpoint=str(checkpoint), progress=False)
+        assert summary == {'total': 3, 'processed': 3, 'skipped': 0, 'errors': 2}
+
+        summary = run_batch([str(corpus)], str(output), checkpoint=str(checkpoint), progress=False)
+        assert summary['skipped'] == 3 and summary['processed'] == 0
+        assert mock_extract.call_count == 3
+
+    records = {os.path.basename(record['path']): record for record in map(json.loads, output.read_text().splitlines())}
+    assert records["a.pdf"]['tokens'] == [{'text': "good", 'lemma': "good", 'position': "NOUN", 'dependency': "ROOT"}]
+    assert records["b.docx"]['error'] == "Язык 'xx' не поддерживается"
+    assert records["c.doc"]['error'] == "Не удалось извлечь текст"
+
+def crashing_extract(path):
+    if "crash" in path:
+        os._exit(1)
+    return open(path).read()
+
+def test_run_batch_survives_worker_crash(tmp_path, corpus):
+    """
+    Проверяет, что аварийное завершение процесса-обработчика записывает ошибку
+    только для файла-виновника, а остальные файлы обрабатываются.
+    """
+    (corpus / "crash.pdf").write_text("good")
+    for i in range(4):
+        (corpus / f"more{i}.pdf").write_text("good")
+    output = tmp_path / "out.jsonl"
+    checkpoint = tmp_path / "manifest.jsonl"
+
+    with patch('parser.batch.extract', side_effect=crashing_extract), \
+            patch('parser.batch.sniff_format', return_value='pdf'), \
+            patch('parser.batch.analyze_text', side_effect=fake_analyze):
+        summary = run_batch([str(corpus)], str(output), workers=2, checkpoint=str(checkpoint), progress=False)
+
+    assert summary == {'total': 8, 'processed': 8, 'skipped': 0, 'errors': 3}
+    records = {os.path.basename(record['path']): record for record in map(json.loads, output.read_text().splitlines())}
+    assert records["crash.pdf"]['error'] == "Процесс обработки аварийно завершился"
+    assert all('tokens' in records[f"more{i}.pdf"] for i in range(4))
+    assert len(checkpoint.read_text().splitlines()) == 8
+
+def test_run_batch_retry_errors(tmp_path, corpus):
+    """
+    Проверяет, что с retry_errors файлы с ошибками обрабатываются заново,
+    а после успешной обработки больше не повторяются.
+    """
+    output = tmp_path / "out.jsonl"
+    checkpoint = tmp_path / "manifest.jsonl"
+    read_file = lambda path: open(path).read()
+    options = dict(checkpoint=str(checkpoint), progress=False)
+
+    with patch('parser.batch.sniff_format', return_value='pdf'), \
+            patch('parser.batch.analyze_text', side_effect=fake_analyze):
+        with patch('parser.batch.extract', side_effect=read_file):
+            run_batch([str(corpus)], str(output), **options)
+            assert run_batch([str(corpus)], str(output), **options)['skipped'] == 3
+
+        # Временная ошибка устранена: повторяются только файлы с ошибками
+        with patch('parser.batch.extract', return_value="good") as mock_extract:
+            summary = run_batch([str(corpus)], str(output), retry_errors=True, **options)
+            assert summary == {'total': 3, 'processed': 2, 'skipped': 1, 'errors': 0}
+            assert sorted(os.path.basename(call.args[0]) for call in mock_extract.call_args_list) == ["b.docx", "c.doc"]
+
+            summary = run_batch([str(corpus)], str(output), retry_errors=True, **options)
+            assert summary['skipped'] == 3
+
+def test_run_batch_columnar(tmp_path, corpus):
+    """
+    Проверяет запись токенов по столбцам.
+    """
+    output = tmp_path / "out.jsonl"
+
+    with patch('parser.batch.extract', return_value="good"), \
+            patch('parser.batch.sniff_format', return_value='pdf'), \
+            patch('parser.batch.analyze_text', side_effect=fake_analyze):
+        run_batch([str(corpus / "a.pdf")], str(output), columnar=True, progress=False)
+
+    record = json.loads(output.read_text())
+    assert record['tokens'] == {'text': ["good"], 'lemma': ["good"], 'position': ["NOUN"], 'dependency': ["ROOT"]}
+
+
+# Тесты для пула запуска внешних утилит
+def python_tool(code):
+    import sys
+    return [sys.executable, '-c', code]
+
+def test_tool_pool_runs_concurrently():
+    """
+    Проверяет, что команды выполняются одновременно в пределах ограничения,
+    а результаты возвращаются в исходном порядке.
+    """
+    import time
+
+    pool = ToolPool(max_concurrency=4)
+    started = time.perf_counter()
+    results = pool.map(python_tool(f"import time; time.sleep(0.3); print({i})") for i in range(4))
+    elapsed = time.perf_counter() - started
+
+    assert [result.stdout.strip() for result in results] == [b"0", b"1", b"2", b"3"]
+    assert all(result.error is None for result in results)
+    assert elapsed < 1.2
+
+def test_tool_pool_timeout_and_output_limit():
+    """
+    Проверяет прерывание зависшей утилиты по тайм-ауту и ограничение размера вывода
+    для утилиты, которая пишет без конца.
+    """
+    import time
+
+    pool = ToolPool(timeout=0.5, max_output=1024 * 1024)
+    endless = "import sys\nwhile True: sys.stdout.write('x' * 65536)"
+    started = time.perf_counter()
+    slow, noisy, failing = pool.map([
+        python_tool("import time; time.sleep(10)"),
+        python_tool(endless),
+        python_tool("import sys; sys.exit(3)"),
+    ])
+
+    assert time.perf_counter() - started < 5
+    assert slow.error.startswith("Превышено время ожидания")
+    assert noisy.error == "Вывод превышает 1048576 байт"
+    assert failing.returncode == 3 and failing.error
+    stats = pool.latency_stats()[os.path.basename(python_tool("")[0])]
+    assert stats['count'] == 3 and stats['timeouts'] == 1 and stats['failures'] == 3
+
+    # Тайм-аут утилиты, непрерывно пишущей вывод, без ограничения его размера
+    started = time.perf_counter()
+    [chatty] = ToolPool(timeout=0.5, max_output=None).map([python_tool(endless)])
+    assert chatty.error.startswith("Превышено время ожидания")
+    assert time.perf_counter() - started < 5
+
+def test_tool_pool_large_input():
+    """
+    Проверяет, что большой stdin не блокирует утилиту, которая сразу пишет вывод.
+    """
+    import asyncio
+
+    data = b"x" * (10 * 1024 * 1024)
+    code = "import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)"
+    result = asyncio.run(ToolPool(timeout=20, max_output=None).run(python_tool(code), input=data))
+
+    assert result.error is None
+    assert result.stdout == data
+
+def test_extract_texts_from_doc():
+    """
+    Проверяет пакетную конвертацию DOC: ошибка в одном файле не мешает остальным.
+    """
+    pool = MagicMock()
+    pool.map.return_value = [
+        ToolResult(['antiword', 'a.doc'], 0, "Текст".encode('utf-8'), 0.1, None),
+        ToolResult(['antiword', 'b.doc'], 1, b"", 0.1, "antiword завершился с кодом 1"),
+    ]
+
+    assert extract_texts_from_doc(['a.doc', 'b.doc'], pool=pool) == ["Текст", ""]
+    assert list(pool.map.call_args.args[0]) == [['antiword', 'a.doc'], ['antiword', 'b.doc']]
+
+
+# Тесты для определения языка
+def test_sample_text_is_bounded():
+    """
+    Проверяет, что для определения языка берётся ограниченная выборка
+    из нескольких частей текста.
+    """
+    text = " ".join(["начало"] * 500 + ["middle"] * 500 + ["конец"] * 500)
+    sample = sample_text(text, max_chars=400, windows=4)
+
+    assert len(sample) <= 400
+    assert sample.startswith("начало") and sample.endswith("конец")
+    assert "middle" in sample
+    assert sample_text("short text") == "short text"
+
+def test_analyze_text_detects_sample_once():
+    """
+    Проверяет, что язык определяется по выборке и результат кэшируется.
+    """
+    long_text = "word " * 5000
+    with patch('parser.utils.text_analyzer.detect', return_value='en') as mock_detect:
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.return_value = make_doc("word")
+            analyze_text(long_text)
+            analyze_text(long_text)
+
+    assert mock_detect.call_count == 1
+    assert len(mock_detect.call_args.args[0]) <= 2000
+
+def test_analyze_text_known_language():
+    """
+    Проверяет, что при указании языка определение языка не выполняется.
+    """
+    with patch('parser.utils.text_analyzer.detect') as mock_detect:
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.return_value = make_doc("Привет")
+            result = analyze_text("Привет", language='ru')
+
+    mock_detect.assert_not_called()
+    mock_spacy.assert_called_once_with("ru_core_news_sm")
+    assert result[0]['text'] == "Привет"
+
+def test_analyze_text_by_paragraph():
+    """
+    Проверяет анализ документа на нескольких языках: каждый абзац
+    обрабатывается моделью своего языка, короткие абзацы наследуют язык предыдущего.
+    """
+    english = "This paragraph is written in English and is long enough."
+    russian = "Этот абзац написан по-русски и достаточно длинный для определения."
+    text = f"{english}\n\n{russian}\n\nКоротко"
+    models = {"en_core_web_sm": MagicMock(), "ru_core_news_sm": MagicMock()}
+    for name, nlp in models.items():
+        nlp.pipe.side_effect = lambda texts, name=name, **kwargs: [make_doc(name[:2]) for text in texts]
+
+    def fake_detect(sample):
+        return 'en' if sample.startswith("This") else 'ru'
+
+    with patch('parser.utils.text_analyzer.detect', side_effect=fake_detect) as mock_detect:
+        with patch('parser.utils.text_analyzer.spacy.load', side_effect=lambda name: models[name]):
+            result = analyze_text_by_paragraph(text)
+
+    assert [token['text'] for token in result] == ["en", "ru", "ru"]
+    assert mock_detect.call_count == 2
+
+
+# Тесты для анализа длинных текстов по фрагментам
+def make_spaced_doc(text):
+    tokens = []
+    position = 0
+    for word in text.split(' '):
+        if word:
+            token = MagicMock()
+            token.text = word
+            token.lemma_ = word.lower()
+            token.pos_ = "NOUN"
+            token.dep_ = "ROOT"
+            token.idx = position
+            token.is_space = False
+            tokens.append(token)
+        position += len(word) + 1
+    return tokens
+
+def test_iter_text_chunks_boundaries():
+    """
+    Проверяет, что фрагменты режутся по границам абзацев и предложений,
+    а их смещения указывают на исходный текст.
+    """
+    text = "Первое предложение. Второе предложение.\n\nНовый абзац. " * 20
+    chunks = list(iter_text_chunks(text, chunk_size=100))
+
+    assert all(len(chunk) <= 100 for _, chunk in chunks)
+    assert all(text[offset:offset + len(chunk)] == chunk for offset, chunk in chunks)
+    assert "".join(chunk for _, chunk in chunks) == text
+    assert all(chunk.endswith(("\n\n", ". ")) for _, chunk in chunks[:-1])
+
+def test_iter_text_chunks_stream():
+    """
+    Проверяет, что поток частей (например, страниц) режется так же, как целый текст.
+    """
+    text = "Предложение номер один. " * 50
+    pieces = (text[i:i + 13] for i in range(0, len(text), 13))
+    assert list(iter_text_chunks(pieces, chunk_size=120)) == list(iter_text_chunks(text, chunk_size=120))
+
+def test_analyze_text_chunked_offsets():
+    """
+    Проверяет, что токены всех фрагментов получают смещения от начала всего текста.
+    """
+    text = "alpha beta. gamma delta. epsilon zeta. "
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_spacy.return_value.pipe.side_effect = lambda pairs, **kwargs: [
+                (make_spaced_doc(chunk), offset) for chunk, offset in pairs
+            ]
+            tokens = list(analyze_text_chunked(text, chunk_size=16))
+
+    assert mock_spacy.return_value.pipe.call_args.kwargs['as_tuples'] is True
+    assert [token['text'] for token in tokens] == text.split()
+    assert all(text[token['idx']:token['idx'] + len(token['text'])] == token['text'] for token in tokens)
+
+def test_analyze_text_chunked_empty():
+    """
+    Проверяет, что пустой текст вызывает LanguageError.
+    """
+    with pytest.raises(LanguageError):
+        list(analyze_text_chunked(["", "  "]))
+
+
+# Тесты для сравнения замеров скорости с базовыми
+def test_benchmark_compare_regressions():
+    """
+    Проверяет, что регрессией считается рост задержки или падение пропускной
+    способности сверх порога, а пропущенные замеры не сравниваются.
+    """
+    from benchmarks.benchmark import compare
+
+    baseline = {
+        'pdf:6.pdf': {'p50': 1.0, 'mb_per_s': 10.0, 'peak_rss_mb': 100.0},
+        'doc:6.doc': {'p50': 1.0},
+    }
+    results = {
+        'pdf:6.pdf': {'p50': 1.1, 'mb_per_s': 7.0, 'peak_rss_mb': None},
+        'doc:6.doc': {'error': "экстрактор не вернул текст"},
+    }
+
+    assert compare(results, baseline, threshold=0.2) == [('pdf:6.pdf', 'mb_per_s', 10.0, 7.0)]
+    assert compare(results, baseline, threshold=0.5) == []
+
+
+# Тесты для метрик этапов обработки
+@pytest.fixture
+def enabled_metrics():
+    from parser.utils import metrics
+
+    metrics.registry.reset()
+    metrics.enable()
+    yield metrics
+    metrics.disable()
+    metrics.registry.reset()
+
+def test_metrics_disabled_is_noop():
+    """
+    Проверяет, что при выключенном сборе метрик ничего не записывается.
+    """
+    from parser.utils import metrics
+
+    metrics.registry.reset()
+    assert metrics.timer('pdf.open') is metrics.timer('spacy.load')
+    with metrics.timer('pdf.open'):
+        metrics.increment('pdf.pages')
+    assert metrics.registry.snapshot() == {'timers': {}, 'values': {}, 'counters': {}, 'gauges': {}}
+
+def test_metrics_stage_timers(enabled_metrics):
+    """
+    Проверяет, что этапы извлечения и анализа замеряются и передаются в обратные вызовы.
+    """
+    events = []
+
+    def on_event(kind, name, value):
+        events.append((kind, name))
+
+    enabled_metrics.add_callback(on_event)
+    try:
+        with patch('parser.utils.pdf_extractor.fitz.open', return_value=make_pdf_document("one", "two")):
+            extract_text_from_pdf("test_sample.pdf")
+        with patch('parser.utils.text_analyzer.detect', return_value='en'):
+            with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+                mock_spacy.return_value.return_value = make_doc("Test")
+                analyze_text("Test")
+    finally:
+        enabled_metrics.remove_callback(on_event)
+
+    snapshot = enabled_metrics.registry.snapshot()
+    assert snapshot['timers']['pdf.open']['count'] == 1
+    assert snapshot['timers']['pdf.page_text']['count'] == 2
+    assert snapshot['counters']['pdf.pages'] == 2
+    assert {'langdetect.detect', 'spacy.load', 'spacy.nlp'} <= set(snapshot['timers'])
+    assert ('timer', 'spacy.nlp') in events
+
+def test_metrics_prometheus_export(tmp_path, enabled_metrics):
+    """
+    Проверяет выгрузку метрик в текстовом формате Prometheus.
+    """
+    enabled_metrics.observe('antiword', 0.5)
+    enabled_metrics.observe('antiword', 1.5)
+    enabled_metrics.increment('extraction_cache.hits', 3)
+
+    path = tmp_path / "parser.prom"
+    enabled_metrics.registry.write_prometheus(str(path))
+    text = path.read_text(encoding='utf-8')
+
+    assert 'parser_stage_seconds_sum{stage="antiword"} 2.000000' in text
+    assert 'parser_stage_seconds_count{stage="antiword"} 2' in text
+    assert 'parser_stage_seconds_max{stage="antiword"} 1.500000' in text
+    assert 'parser_events_total{name="extraction_cache.hits"} 3' in text
+
+
+# Тесты для отложенного импорта тяжёлых зависимостей
+HEAVY_MODULES = ('spacy', 'langdetect', 'fitz', 'docx', 'bs4', 'requests', 'httpx')
+IMPORT_BUDGET_SECONDS = 0.25
+
+def test_entry_points_import_without_heavy_dependencies():
+    """
+    Проверяет, что импорт пакета и модулей-обработчиков не загружает тяжёлые зависимости
+    и укладывается в бюджет времени.
+    """
+    import sys
+
+    code = (
+        "import json, sys, time\n"
+        "started = time.perf_counter()\n"
+        "import parser, parser.__main__, parser.text_analyzer, parser.pdf_processor\n"
+        "import parser.docx_processor, parser.doc_processor, parser.djvu_processor\n"
+        "import parser.utils.html_parser, parser.utils.dispatcher\n"
+        "elapsed = time.perf_counter() - started\n"
+        f"heavy = [name for name in {HEAVY_MODULES!r} if name in sys.modules]\n"
+        "print(json.dumps({'elapsed': elapsed, 'heavy': heavy}))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, '-c', code], cwd=root, stdout=subprocess.PIPE, check=True)
+    report = json.loads(result.stdout)
+
+    assert report['heavy'] == []
+    assert report['elapsed'] < IMPORT_BUDGET_SECONDS
+
+def test_lazy_module_loads_on_first_use():
+    """
+    Проверяет, что модуль импортируется при первом обращении к атрибуту и поддерживает patch.
+    """
+    from parser.utils.lazy_import import lazy_import
+
+    module = lazy_import('colorsys')
+    assert object.__getattribute__(module, '_module') is None
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+
+    with patch('colorsys.rgb_to_hsv', return_value='patched'):
+        assert module.rgb_to_hsv(1.0, 0.0, 0.0) == 'patched'
+    assert module.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+
+
+# Тесты для потокового извлечения текста из DOCX
+def make_docx_bytes():
+    from docx import Document as make_document
+    import io
+
+    document = make_document()
+    document.add_paragraph("Первый абзац")
+    paragraph = document.add_paragraph("До табуляции")
+    paragraph.add_run().add_tab()
+    paragraph.add_run("после")
+    table = document.add_table(rows=1, cols=2)
+    table.cell(0, 0).text = "Ячейка 1"
+    table.cell(0, 1).text = "Ячейка 2"
+    document.add_paragraph("Последний абзац")
+    document.sections[0].header.paragraphs[0].text = "Колонтитул"
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def test_iter_docx_paragraphs_sources(tmp_path):
+    """
+    Проверяет потоковое чтение абзацев и таблиц из пути, байтов и файлового объекта.
+    """
+    import io
+    from parser.utils.docx_extractor import iter_docx_paragraphs
+
+    content = make_docx_bytes()
+    file_path = tmp_path / "sample.docx"
+    file_path.write_bytes(content)
+    expected = ["Первый абзац", "До табуляции\tпосле", "Ячейка 1", "Ячейка 2", "Последний абзац"]
+
+    assert list(iter_docx_paragraphs(str(file_path))) == expected
+    assert list(iter_docx_paragraphs(content)) == expected
+    assert list(iter_docx_paragraphs(io.BytesIO(content))) == expected
+
+def test_iter_docx_paragraphs_parts():
+    """
+    Проверяет чтение колонтитулов и ошибку для неизвестной части документа.
+    """
+    from parser.utils.docx_extractor import iter_docx_paragraphs
+
+    content = make_docx_bytes()
+    assert list(iter_docx_paragraphs(content, parts=('headers',))) == ["Колонтитул"]
+    with pytest.raises(ValueError):
+        list(iter_docx_paragraphs(content, parts=('unknown',)))
+
+def test_iter_docx_paragraphs_text_box_once():
+    """
+    Проверяет, что текст надписи, хранящейся в mc:Choice и mc:Fallback,
+    выдаётся один раз.
+    """
+    import io
+    from parser.utils.docx_extractor import _iter_part_paragraphs
+
+    box = '<w:txbxContent><w:p><w:r><w:t>Box</w:t></w:r></w:p></w:txbxContent>'
+    xml = ('<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+           'xmlns:mc="http://schemas.openxmlformats.org/markup-compatibility/2006"><w:body>'
+           '<w:p><w:r><mc:AlternateContent>'
+           f'<mc:Choice Requires="wps"><w:drawing>{box}</w:drawing></mc:Choice>'
+           f'<mc:Fallback><w:pict>{box}</w:pict></mc:Fallback>'
+           '</mc:AlternateContent></w:r><w:r><w:t>Outer</w:t></w:r></w:p>'
+           '<w:p><w:r><w:t>Next</w:t></w:r></w:p>'
+           '</w:body></w:document>').encode('utf-8')
+
+    assert list(_iter_part_paragraphs(io.BytesIO(xml))) == ["Box", "Outer", "Next"]
+
+def test_iter_docx_paragraphs_bounded_memory():
+    """
+    Проверяет, что прочитанные абзацы не накапливаются в памяти:
+    пик памяти не растёт с числом абзацев.
+    """
+    import io
+    import tracemalloc
+    from parser.utils.docx_extractor import _iter_part_paragraphs
+
+    def peak_memory(count):
+        body = ''.join(f'<w:p><w:r><w:t>Абзац {i}</w:t></w:r></w:p>' for i in range(count))
+        xml = ('<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+               f'<w:body>{body}</w:body></w:document>').encode('utf-8')
+        tracemalloc.start()
+        try:
+            assert sum(1 for _ in _iter_part_paragraphs(io.BytesIO(xml))) == count
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    assert peak_memory(20000) < 2 * peak_memory(2000)
+
+def test_extract_text_from_docx_fast(tmp_path, extraction_cache):
+    """
+    Проверяет быстрый режим извлечения и раздельное кэширование режимов.
+    """
+    file_path = tmp_path / "sample.docx"
+    file_path.write_bytes(make_docx_bytes())
+
+    fast_text = extract_text_from_docx(str(file_path), fast=True)
+    assert fast_text == "Первый абзац\nДо табуляции\tпосле\nЯчейка 1\nЯчейка 2\nПоследний абзац"
+    assert "Ячейка 1" not in extract_text_from_docx(str(file_path))
+    assert extract_text_from_docx(str(file_path), fast=True, parts=('document', 'headers')).endswith("Колонтитул")
+
+def test_extract_text_from_docx_fast_error(capsys):
+    """
+    Проверяет, что повреждённый DOCX в быстром режиме даёт пустую строку.
+    """
+    assert extract_text_from_docx(b"not a zip archive", fast=True) == ""
+    assert "Ошибка при чтении DOCX" in capsys.readouterr().out
+
+
+# Тесты для HTTP-сервиса анализа
+def test_micro_batcher_groups_requests():
+    """
+    Проверяет, что одновременные запросы собираются в пакеты не больше max_batch_size.
+    """
+    from parser.service import MicroBatcher
+
+    sizes = []
+
+    def process(items):
+        sizes.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=3, max_wait=0.5)
+    futures = [batcher.submit(number) for number in range(7)]
+    results = [future.result(timeout=5) for future in futures]
+    batcher.close()
+
+    assert results == [0, 2, 4, 6, 8, 10, 12]
+    assert sum(sizes) == 7
+    assert max(sizes) == 3
+
+def test_micro_batcher_backpressure():
+    """
+    Проверяет, что при переполнении очереди запрос отклоняется, а ошибки передаются по одному.
+    """
+    import threading
+    import time
+    from parser.service import MicroBatcher, QueueFull
+
+    release = threading.Event()
+
+    def process(items):
+        release.wait(5)
+        return [ValueError(item) if item == "bad" else item for item in items]
+
+    batcher = MicroBatcher(process, max_batch_size=1, max_wait=0, max_queue=1)
+    first = batcher.submit("good")
+    while batcher.queue_depth():
+        time.sleep(0.01)
+    second = batcher.submit("bad")
+    with pytest.raises(QueueFull):
+        batcher.submit("extra")
+
+    release.set()
+    assert first.result(timeout=5) == "good"
+    with pytest.raises(ValueError):
+        second.result(timeout=5)
+    batcher.close()
+
+def test_analyze_batch_isolates_errors():
+    """
+    Проверяет, что ошибка одного текста не мешает анализу остальных текстов пакета.
+    """
+    from parser.service import analyze_batch
+
+    def fake_texts(texts, batch_size, profile, language, errors):
+        assert errors == 'return'
+        if profile == 'pos':
+            raise RuntimeError("Сбой модели")
+        return [LanguageError(message="Плохой текст") if text == "bad" else [{'text': text}] for text in texts]
+
+    with patch('parser.service.analyze_texts', side_effect=fake_texts):
+        results = analyze_batch([("good", 'full', 'en'), ("bad", 'full', 'en'), ("other", 'pos', 'en')])
+
+    assert results[0] == [{'text': "good"}]
+    assert isinstance(results[1], LanguageError)
+    assert isinstance(results[2], RuntimeError)
+
+@pytest.fixture
+def analysis_service(enabled_metrics):
+    import threading
+    from parser.service import close_server, make_server
+
+    server = make_server(port=0, max_wait=0.05)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    close_server(server)
+
+def post_json(url, payload=None, data=None):
+    import urllib.error
+    import urllib.request
+
+    if data is None:
+        data = json.dumps(payload).encode('utf-8')
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=data, method='POST')) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+def test_service_analyze_and_extract(analysis_service):
+    """
+    Проверяет анализ и извлечение текста через HTTP и выдачу метрик пакетирования.
+    """
+    import urllib.request
+
+    def fake_texts(texts, batch_size, profile, language, errors):
+        return [[{'text': text, 'profile': profile}] for text in texts]
+
+    with patch('parser.service.analyze_texts', side_effect=fake_texts), \
+            patch('parser.service.sniff_format', return_value='pdf'), \
+            patch('parser.service.extract', return_value="Извлечённый текст"):
+        status, body = post_json(analysis_service + "/analyze", {'text': "Test", 'profile': 'pos'})
+        assert status == 200
+        assert body == {'tokens': [{'text': "Test", 'profile': 'pos'}]}
+
+        status, body = post_json(analysis_service + "/extract?analyze=1", data=b"%PDF-1.4")
+        assert status == 200
+        assert body['format'] == 'pdf'
+        assert body['tokens'] == [{'text': "Извлечённый текст", 'profile': 'full'}]
+
+    with urllib.request.urlopen(analysis_service + "/metrics") as response:
+        text = response.read().decode('utf-8')
+    assert 'parser_value_count{name="service.batch_size"} 2' in text
+    assert 'parser_gauge{name="service.queue_depth"}' in text
+
+def test_service_bad_requests(analysis_service):
+    """
+    Проверяет ответы сервиса на некорректные запросы.
+    """
+    assert post_json(analysis_service + "/analyze", data=b"not json")[0] == 400
+    assert post_json(analysis_service + "/analyze", {'text': "Test", 'profile': 'unknown'})[0] == 400
+    assert post_json(analysis_service + "/analyze", {'text': "Test", 'language': 'xx'})[0] == 400
+    assert post_json(analysis_service + "/unknown", {})[0] == 404
+
+
+# Тесты для асинхронного API
+@pytest.fixture
+def fake_tools(tmp_path, monkeypatch):
+    """
+    Поддельные antiword и djvutxt: печатают текст, для файла slow.* зависают,
+    для файла chatty.* пишут вывод без конца, а для invalid.* — не UTF-8.
+    """
+    import stat
+    import sys
+
+    for name in ('antiword', 'djvutxt'):
+        script = tmp_path / name
+        script.write_text(
+            f"#!{sys.executable}\n"
+            "import sys, time\n"
+            "if 'slow' in sys.argv[-1]:\n"
+            "    time.sleep(30)\n"
+            "while 'chatty' in sys.argv[-1]:\n"
+            "    sys.stdout.write('x' * 65536)\n"
+            "if sys.argv[-1].startswith('invalid'):\n"
+            "    sys.stdout.buffer.write(b'\\xff\\xfe')\n"
+            "    sys.exit(0)\n"
+            f"print('{name}: ' + sys.argv[-1])\n"
+        )
+        script.chmod(script.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', str(tmp_path) + os.pathsep + os.environ['PATH'])
+    return tmp_path
+
+def test_async_extract_does_not_block_loop():
+    """
+    Проверяет, что извлечение выполняется вне цикла событий и поддерживает тайм-аут.
+    """
+    import asyncio
+    import time
+    from parser.utils.async_api import aextract_text_from_pdf, run_blocking
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.ensure_future(ticker())
+        with pytest.raises(asyncio.TimeoutError):
+            await run_blocking('extract', time.sleep, 0.5, timeout=0.1)
+        with patch('parser.utils.pdf_extractor.fitz.open', return_value=make_pdf_document("one ", "two")):
+            text = await aextract_text_from_pdf("test_sample.pdf")
+        task.cancel()
+        return ticks, text
+
+    ticks, text = asyncio.run(scenario())
+    assert text == "one two"
+    assert ticks >= 5
+
+def test_async_analyze_text():
+    """
+    Проверяет асинхронный анализ текста.
+    """
+    import asyncio
+    from parser.utils.async_api import aanalyze_text, aanalyze_texts
+
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            mock_nlp = mock_spacy.return_value
+            mock_nlp.return_value = make_doc("Test")
+            mock_nlp.pipe.side_effect = lambda texts, **kwargs: [make_doc(text) for text in texts]
+            result = asyncio.run(aanalyze_text("Test"))
+            results = asyncio.run(aanalyze_texts(["One", "Two"]))
+
+    assert [token['text'] for token in result] == ["Test"]
+    assert [[token['text'] for token in tokens] for tokens in results] == [["One"], ["Two"]]
+
+def test_async_tools(fake_tools):
+    """
+    Проверяет запуск antiword и djvutxt асинхронными подпроцессами и их тайм-аут.
+    """
+    import asyncio
+    import time
+    from parser.utils.async_api import aextract_text_from_djvu, aextract_text_from_doc
+    from parser.utils.subprocess_pool import ToolPool
+
+    pool = ToolPool(max_concurrency=2)
+
+    async def scenario():
+        texts = await asyncio.gather(
+            aextract_text_from_doc("a.doc", pool=pool),
+            aextract_text_from_djvu("b.djvu", pool=pool),
+        )
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await aextract_text_from_doc("slow.doc", timeout=0.3, pool=pool)
+        return texts, time.perf_counter() - started
+
+    texts, elapsed = asyncio.run(scenario())
+    assert texts == ["antiword: a.doc\n", "djvutxt: b.djvu\n"]
+    assert elapsed < 5
+
+def test_async_tools_invalid_output_and_cache(fake_tools, extraction_cache, capsys):
+    """
+    Проверяет, что некорректный UTF-8 от утилиты даёт пустую строку, как в синхронных
+    экстракторах, а извлечённый текст кэшируется в общем с ними кэше.
+    """
+    import asyncio
+    from parser.utils.async_api import aextract_text_from_djvu, aextract_text_from_doc
+    from parser.utils.subprocess_pool import ToolPool
+
+    pool = ToolPool(max_concurrency=2)
+    assert asyncio.run(aextract_text_from_doc("invalid.doc", pool=pool)) == ""
+    assert "Ошибка при чтении DOC" in capsys.readouterr().out
+
+    document = fake_tools / "a.doc"
+    document.write_bytes(b"doc content")
+    expected = f"antiword: {document}\n"
+    assert asyncio.run(aextract_text_from_doc(str(document), pool=pool)) == expected
+
+    broken_pool = MagicMock()
+    broken_pool.run.side_effect = AssertionError("утилита не должна запускаться")
+    assert asyncio.run(aextract_text_from_doc(str(document), pool=broken_pool)) == expected
+    with patch('parser.utils.sources.subprocess.run', side_effect=AssertionError("не должна запускаться")):
+        assert extract_text_from_doc(str(document)) == expected
+
+    scan = fake_tools / "b.djvu"
+    scan.write_bytes(b"djvu content")
+    with patch('parser.utils.sources.subprocess.run', return_value=MagicMock(stdout=b"Page 1\n")):
+        assert extract_text_from_djvu(str(scan)) == "Page 1\n"
+    assert asyncio.run(aextract_text_from_djvu(str(scan), pool=broken_pool)) == "Page 1\n"
+
+def test_async_tools_cancel_chatty_process(fake_tools):
+    """
+    Проверяет, что тайм-аут и отмена сразу освобождают вызывающего,
+    даже если утилита продолжает писать вывод.
+    """
+    import asyncio
+    import time
+    from parser.utils.async_api import aextract_text_from_djvu, aextract_text_from_doc
+    from parser.utils.subprocess_pool import ToolPool
+
+    pool = ToolPool(max_concurrency=2, max_output=None)
+
+    async def scenario():
+        started = time.perf_counter()
+        with pytest.raises(asyncio.TimeoutError):
+            await aextract_text_from_doc("chatty.doc", timeout=0.3, pool=pool)
+        timed_out = time.perf_counter() - started
+
+        task = asyncio.ensure_future(aextract_text_from_djvu("chatty.djvu", pool=pool))
+        await asyncio.sleep(0.3)
+        started = time.perf_counter()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return timed_out, time.perf_counter() - started
+
+    timed_out, cancelled = asyncio.run(asyncio.wait_for(scenario(), 30))
+    assert timed_out < 3
+    assert cancelled < 3
+
+def test_async_executor_configuration():
+    """
+    Проверяет настройку исполнителей и ошибку для неизвестного вида.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    from parser.utils.async_api import configure_executor, get_executor
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    configure_executor('analyze', executor)
+    try:
+        assert get_executor('analyze') is executor
+    finally:
+        configure_executor('analyze', None)
+        executor.shutdown()
+    assert get_executor('analyze') is not executor
+    with pytest.raises(ValueError):
+        configure_executor('render', executor)
+
+
+# Тесты для извлечения текста из буферов в памяти
+def test_extractors_accept_buffers():
+    """
+    Проверяет извлечение текста из bytes, memoryview и файловых объектов.
+    """
+    import io
+
+    with open(os.path.join(RECOURSE_DIR, '6.pdf'), 'rb') as file:
+        pdf_data = file.read()
+    with open(os.path.join(RECOURSE_DIR, '6.docx'), 'rb') as file:
+        docx_data = file.read()
+
+    expected_pdf = extract_text_from_pdf(os.path.join(RECOURSE_DIR, '6.pdf'))
+    assert expected_pdf
+    assert extract_text_from_pdf(pdf_data) == expected_pdf
+    assert extract_text_from_pdf(memoryview(bytearray(pdf_data))) == expected_pdf
+    assert extract_text_from_pdf(io.BytesIO(pdf_data), workers=2) == expected_pdf
+
+    expected_docx = extract_text_from_docx(os.path.join(RECOURSE_DIR, '6.docx'))
+    assert extract_text_from_docx(memoryview(docx_data)) == expected_docx
+    assert extract_text_from_docx(bytearray(docx_data), fast=True) == expected_docx
+
+def test_tool_extractors_accept_buffers(fake_tools):
+    """
+    Проверяет, что antiword и djvutxt получают буфер через memfd или временный файл.
+    """
+    import sys
+
+    doc_text = extract_text_from_doc(b"DOC data")
+    djvu_text = extract_text_from_djvu(memoryview(b"DJVU data"))
+    assert doc_text.startswith("antiword: ")
+    assert djvu_text.startswith("djvutxt: ")
+    if sys.platform.startswith('linux'):
+        assert doc_text.startswith("antiword: /dev/fd/")
+
+def test_tool_input_passes_buffer_content():
+    """
+    Проверяет, что внешняя утилита читает из переданного пути исходное содержимое буфера.
+    """
+    import sys
+    from parser.utils.sources import tool_input
+
+    data = bytearray(b"x" * 100000 + b"end")
+    with tool_input(memoryview(data)) as (path, pass_fds):
+        result = subprocess.run(
+            [sys.executable, '-c', f"print(len(open({path!r}, 'rb').read()))"],
+            stdout=subprocess.PIPE, check=True, pass_fds=pass_fds,
+        )
+    assert int(result.stdout) == len(data)
+
+def test_extraction_cache_hashes_buffers(extraction_cache):
+    """
+    Проверяет кэширование извлечения для байтов и пропуск кэша для файловых объектов.
+    """
+    import io
+
+    with patch('parser.utils.pdf_extractor.fitz.open', return_value=make_pdf_document("Test text")) as mock_open_pdf:
+        assert extract_text_from_pdf(b"%PDF-1.4 data") == "Test text"
+        assert extract_text_from_pdf(bytearray(b"%PDF-1.4 data")) == "Test text"
+        assert mock_open_pdf.call_count == 1
+
+        extract_text_from_pdf(io.BytesIO(b"%PDF-1.4 data"))
+        assert mock_open_pdf.call_count == 2
+
+def test_extract_path_only_format_gets_temp_file():
+    """
+    Проверяет, что сторонний экстрактор без поддержки буферов получает путь к файлу.
+    """
+    register_format('txt', lambda header, source: header.startswith(b'TXT:'),
+                    lambda path: open(path, encoding='utf-8').read()[4:], '.txt', first=True)
+    try:
+        assert extract(memoryview(b"TXT:hello")) == "hello"
+    finally:
+        unregister_format('txt')
+
+
+# Тесты для инкрементального анализа редакций документа
+def incremental_nlp(mock_spacy):
+    analyzed = []
+
+    def pipe(texts, **kwargs):
+        texts = list(texts)
+        analyzed.extend(texts)
+        return [make_spaced_doc(text) for text in texts]
+
+    mock_spacy.return_value.pipe.side_effect = pipe
+    return analyzed
+
+def test_analyze_text_incremental_reuses_paragraphs():
+    """
+    Проверяет, что повторно анализируются только изменённые абзацы,
+    а смещения токенов пересчитываются для новой редакции.
+    """
+    from parser.utils.incremental import analyze_text_incremental
+
+    first = "alpha beta\n\ngamma delta\n\nepsilon"
+    second = "alpha beta\n\nNEW para here\n\ngamma delta\n\nepsilon"
+
+    with patch('parser.utils.text_analyzer.detect', return_value='en'):
+        with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+            analyzed = incremental_nlp(mock_spacy)
+            result = analyze_text_incremental(first)
+            assert (result.reused, result.analyzed) == (0, 3)
+
+            analyzed.clear()
+            revised = analyze_text_incremental(second, previous=result)
+
+    assert (revised.reused, revised.analyzed) == (3, 1)
+    assert analyzed == ["NEW para here"]
+    tokens = revised.tokens()
+    assert [token['text'] for token in tokens] == ["alpha", "beta", "NEW", "para", "here", "gamma", "delta", "epsilon"]
+    for token in tokens:
+        assert second[token['idx']:token['idx'] + len(token['text'])] == token['text']
+
+def test_analyze_text_incremental_profile_and_state():
+    """
+    Проверяет полный повторный анализ при смене профиля и сохранение состояния в словарь.
+    """
+    from parser.utils.incremental import IncrementalAnalysis, analyze_text_incremental
+
+    text = "alpha beta\ngamma"
+    with patch('parser.utils.text_analyzer.spacy.load') as mock_spacy:
+        incremental_nlp(mock_spacy)
+        result = analyze_text_incremental(text, language='en', separator=r'\n')
+        restored = IncrementalAnalysis.from_dict(json.loads(json.dumps(result.to_dict())))
+
+        same = analyze_text_incremental(text + "\ndelta", previous=restored, language='en')
+        other = analyze_text_incremental(text, previous=restored, profile='pos', language='en')
+
+    assert (same.reused, same.analyzed) == (2, 1)
+    assert (other.reused, other.analyzed) == (0, 2)
+    with pytest.raises(LanguageError):
+        analyze_text_incremental("  \n\n ", language='en')
+
+
+# Тесты для обратного индекса по леммам
+def make_tokens(*pairs):
+    return [{'text': lemma, 'lemma': lemma, 'position': pos, 'dependency': "dep"} for lemma, pos in pairs]
+
+def test_varint_roundtrip():
+    """
+    Проверяет кодирование и декодирование чисел varint.
+    """
+    from parser.utils.inverted_index import decode_varints, encode_varint
+
+    values = [0, 1, 127, 128, 300, 2 ** 32 + 5]
+    out = bytearray()
+    for value in values:
+        encode_varint(value, out)
+    assert decode_varints(bytes(out)) == values
+    assert len(out) < len(values) * 4
+
+def test_inverted_index_queries(tmp_path):
+    """
+    Проверяет поиск по лемме, фразе и части речи, в том числе через знаки препинания.
+    """
+    from parser.utils.inverted_index import InvertedIndex
+
+    with InvertedIndex(str(tmp_path / "index")) as index:
+        index.add_document("a.pdf", make_tokens(("кошка", "NOUN"), ("любить", "VERB"), ("собака", "NOUN")))
+        index.add_document("b.pdf", make_tokens(("собака", "NOUN"), (",", "PUNCT"), ("кошка", "NOUN")))
+        index.add_document("c.pdf", make_tokens(("Стекло", "ADJ"), ("кошка", "PROPN")))
+        # Документы видны в поиске только после записи сегмента
+        assert index.search("кошка") == []
+        index.commit()
+
+        assert index.search("кошка") == ["a.pdf", "b.pdf", "c.pdf"]
+        assert index.search("Кошка", pos="NOUN") == ["a.pdf", "b.pdf"]
+        assert index.search("стекло") == ["c.pdf"]
+        assert index.positions("кошка") == {"a.pdf": [0], "b.pdf": [1], "c.pdf": [1]}
+        assert index.phrase(["собака", "кошка"]) == ["b.pdf"]
+        assert index.phrase(["стекло", "кошка"], pos=[None, "PROPN"]) == ["c.pdf"]
+        assert index.phrase(["стекло", "кошка"], pos=[None, "NOUN"]) == []
+        assert index.search_all(["собака", "кошка"]) == ["a.pdf", "b.pdf"]
+        assert index.search("мышь") == []
+        with pytest.raises(ValueError):
+            index.search("кошка", pos="NOT_A_TAG")
+
+def test_inverted_index_segments_and_merge(tmp_path):
+    """
+    Проверяет запись сегментов, их слияние и открытие индекса с диска.
+    """
+    from parser.utils.inverted_index import InvertedIndex
+
+    directory = str(tmp_path / "index")
+    with InvertedIndex(directory, merge_factor=3, max_buffered_docs=2) as index:
+        for number in range(5):
+            index.add_document(f"doc{number}", make_tokens(("общий", "NOUN"), (f"слово{number}", "NOUN")))
+        # Два полных буфера записаны сегментами, пятый документ ещё в памяти
+        assert index.segment_count() == 2
+
+    with InvertedIndex(directory) as index:
+        assert len(index) == 5
+        assert index.segment_count() == 1  # при третьем сегменте сработало слияние
+        assert index.search("общий") == [f"doc{number}" for number in range(5)]
+        assert index.search("слово3") == ["doc3"]
+
+        index.add_document("doc5", make_tokens(("общий", "NOUN")))
+        index.commit()
+        assert index.segment_count() == 2
+        index.merge()
+        assert index.segment_count() == 1
+        assert index.phrase(["общий", "слово4"]) == ["doc4"]
+        assert index.search("общий")[-1] == "doc5"
+
+    assert sorted(os.listdir(directory)) == ["segment_000006.pix", "segments.json"]
+
+def test_index_command_from_batch_results(tmp_path, capsys):
+    """
+    Проверяет построение индекса из результатов пакетной обработки и поиск из командной строки.
+    """
+    from parser.index import index_main, search_main
+
+    results = tmp_path / "results.jsonl"
+    records = [
+        {'path': "a.pdf", 'tokens': make_tokens(("кошка", "NOUN"), ("спать", "VERB"))},
+        {'path': "b.pdf", 'tokens': {'text': ["кошки"], 'lemma': ["кошка"], 'position': ["NOUN"],
+                                     'dependency': ["ROOT"]}},
+        {'path': "c.pdf", 'error': "Не удалось извлечь текст"},
+    ]
+    results.write_text('\n'.join(json.dumps(record, ensure_ascii=False) for record in records), encoding='utf-8')
+    directory = str(tmp_path / "index")
+
+    assert index_main([directory, str(results)]) == 0
+    assert search_main([directory, "кошка", "--pos", "NOUN"]) == 0
+    assert capsys.readouterr().out.split() == ["a.pdf", "b.pdf"]
+    assert search_main([directory, "кошка", "спать", "--phrase"]) == 0
+    assert capsys.readouterr().out.split() == ["a.pdf"]
+    assert search_main([directory, "собака"]) == 1